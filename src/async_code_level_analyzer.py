@@ -0,0 +1,212 @@
+import asyncio
+from collections import Counter
+
+from code_level_analyzer import CodeAnalyzer
+from llm_scheduler import LLMScheduler, estimate_tokens
+from llm_registry import get_async_prompt_chain, aclose_async_http_client
+from result_writer import ResultWriter
+from utils.constants import (
+    ASYNC_LLM_MAX_CONCURRENT_REQUESTS,
+    CODE_LEVEL_PROMPT,
+    UNKNOWN_RESPONSE_PROMPT,
+    SYSTEM_PROMPT,
+)
+
+
+class AsyncCodeAnalyzer(CodeAnalyzer):
+    """Code level analysis on asyncio. LLM calls are awaited with ainvoke
+    instead of blocking a thread each, a semaphore caps the requests in
+    flight and the tokens per minute budget is shared with the scheduler."""
+
+    def __init__(self, *args, max_concurrency=ASYNC_LLM_MAX_CONCURRENT_REQUESTS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_concurrency = max_concurrency
+        self.token_bucket = LLMScheduler().token_bucket
+        self.semaphore = None
+        self.unknown_context_tasks = {}
+
+    def get_code_level_chain(self):
+        return get_async_prompt_chain(
+            CODE_LEVEL_PROMPT,
+            ["best_practices", "project_frameworks", "file_path", "code"],
+            temperature=0,
+        )
+
+    def get_unknown_response_chain(self):
+        return get_async_prompt_chain(
+            UNKNOWN_RESPONSE_PROMPT,
+            ["file_path", "context", "code", "best_practice"],
+            temperature=0,
+        )
+
+    async def _ainvoke(self, chain, inputs, tokens):
+        async with self.semaphore:
+            await self.token_bucket.acquire_async(tokens)
+            return await chain.ainvoke(inputs)
+
+    async def analyze_chunk_async(self, code_chunk, file_path, best_practice_chunk):
+        try:
+            result = await self._ainvoke(
+                self.get_code_level_chain(),
+                {
+                    "best_practices": best_practice_chunk,
+                    "project_frameworks": self.project_frameworks,
+                    "file_path": file_path,
+                    "code": code_chunk,
+                },
+                estimate_tokens(CODE_LEVEL_PROMPT, code_chunk, best_practice_chunk),
+            )
+            res = self.format_output(result.content)
+            self.logger.info(f"Chunk analysis completed for {file_path}")
+            return res
+        except Exception as e:
+            self.logger.error(f"Chunk analysis failed and get exception for {file_path}: {e}")
+            return {}
+
+    async def _get_unknown_context_async(self, best_practice):
+        # Unknown verdicts of the same practice await one retrieval
+        key = (best_practice["statement"], best_practice["reference"])
+        if key not in self.unknown_context_tasks:
+            self.unknown_context_tasks[key] = asyncio.ensure_future(
+                self._retrieve_unknown_context_async(best_practice)
+            )
+        task = self.unknown_context_tasks[key]
+        try:
+            return await task
+        except Exception:
+            # A failed retrieval is not memoized, the next caller retries
+            if self.unknown_context_tasks.get(key) is task:
+                del self.unknown_context_tasks[key]
+            raise
+
+    async def _retrieve_unknown_context_async(self, best_practice):
+        # Page loading and indexing are blocking library calls, they run on a thread
+        async with self.semaphore:
+            await self.token_bucket.acquire_async(
+                estimate_tokens(SYSTEM_PROMPT, best_practice["statement"])
+            )
+            return await asyncio.to_thread(self._get_unknown_context, best_practice)
+
+    async def _handle_unknown_chunk_async(self, best_practice, context, file_content, code_file):
+        response = await self._ainvoke(
+            self.get_unknown_response_chain(),
+            {
+                "file_path": code_file,
+                "context": context,
+                "code": file_content,
+                "best_practice": best_practice,
+            },
+            estimate_tokens(UNKNOWN_RESPONSE_PROMPT, context, file_content, best_practice),
+        )
+        return self.parse_unknown_response(response.content)
+
+    async def _handle_unknown_practice_async(self, keyword, code_file):
+        best_practice = self.best_practice_keyword_dict[keyword]
+        try:
+            context = await self._get_unknown_context_async(best_practice)
+        except Exception as ex:
+            self.logger.error(str(ex))
+            return [{"status": "Skipped"}]
+
+        self.logger.info(f"Splitting code_file: {code_file} for analyzing unknown response")
+        chunk_results = await asyncio.gather(
+            *(
+                self._handle_unknown_chunk_async(best_practice, context, chunk, code_file)
+                for _, _, chunk in self.split_file_for_unknown_response(
+                    code_file, best_practice, context
+                )
+            ),
+            return_exceptions=True,
+        )
+        combined_results = []
+        for chunk_result in chunk_results:
+            if isinstance(chunk_result, Exception):
+                self.logger.error(str(chunk_result))
+            else:
+                combined_results.extend(chunk_result)
+        self.logger.info(f"Handled unknown response for: {keyword}")
+        return combined_results
+
+    async def _analyze_request_async(self, request):
+        file_path, each_file_chunk, best_practice_chunk = request
+        return request, await self.analyze_chunk_async(
+            each_file_chunk, file_path, best_practice_chunk
+        )
+
+    async def aexecute_file_analyze(self):
+        old_responses = {}
+        final_response = {}
+        self.result_writer = await asyncio.to_thread(ResultWriter)
+        try:
+            # Created here so the semaphore and tasks belong to the running event loop
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.unknown_context_tasks = {}
+            requests = await asyncio.to_thread(self.get_analysis_requests, old_responses)
+            cached_responses, requests = await asyncio.to_thread(
+                self.split_cached_requests, requests
+            )
+            pending_requests = Counter(file_path for file_path, _, _ in requests)
+            unknown_handled_practices = set()
+            new_responses = {}
+            stored_files = set()
+            for file_path, response in cached_responses:
+                if file_path not in new_responses:
+                    new_responses[file_path] = {}
+                self.combine_chunk_responses(
+                    new_responses[file_path],
+                    self._handle_unknown_responses(
+                        response, file_path, unknown_handled_practices
+                    ),
+                )
+            for file_path in new_responses:
+                if not pending_requests[file_path]:
+                    self.store_completed_file(
+                        file_path, new_responses, unknown_handled_practices, stored_files
+                    )
+
+            for next_response in asyncio.as_completed(
+                [self._analyze_request_async(request) for request in requests]
+            ):
+                request, response = await next_response
+                file_path = request[0]
+                self.store_chunk_responses([(request, response)])
+                if file_path not in new_responses:
+                    new_responses[file_path] = {}
+                self.combine_chunk_responses(
+                    new_responses[file_path],
+                    self._handle_unknown_responses(
+                        response, file_path, unknown_handled_practices
+                    ),
+                )
+                pending_requests[file_path] -= 1
+                if not pending_requests[file_path]:
+                    self.store_completed_file(
+                        file_path, new_responses, unknown_handled_practices, stored_files
+                    )
+
+            unknown_handled_practices = sorted(unknown_handled_practices)
+            unknown_responses = await asyncio.gather(
+                *(
+                    self._handle_unknown_practice_async(keyword, file_path)
+                    for keyword, file_path in unknown_handled_practices
+                )
+            )
+            for (keyword, file_path), responses in zip(
+                unknown_handled_practices, unknown_responses
+            ):
+                new_responses[file_path].setdefault(keyword, []).extend(responses)
+
+            self.store_remaining_files(new_responses, stored_files)
+            final_response = self.combine_responses_into_final_response(
+                old_responses, new_responses
+            )
+        except Exception as e:
+            self.logger.error(f"Code level analysis failed: {e}")
+        finally:
+            await asyncio.to_thread(self.result_writer.close)
+            self.result_writer = None
+            # The pool is bound to this event loop, the next run gets its own
+            await aclose_async_http_client()
+
+        self.logger.info("Code level analysis completed.")
+        return final_response
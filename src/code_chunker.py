@@ -0,0 +1,163 @@
+import ast
+from functools import lru_cache
+from itertools import accumulate
+
+from utils.utilities import count_tokens
+from utils.constants import (
+    LLM_CONTEXT_TOKENS,
+    LLM_CONTEXT_SAFETY_MARGIN,
+    LLM_RESPONSE_TOKEN_ESTIMATE,
+    CODE_CHUNK_PRACTICE_TOKEN_RESERVE,
+    CODE_CHUNK_MIN_TOKENS,
+    CODE_LEVEL_PROMPT,
+)
+
+
+def get_code_token_budget(*prompt_texts, reserved_tokens=0):
+    """Tokens left for code in a prompt, after the prompt texts, the reserved
+    tokens and the response, within the safe share of the context window."""
+    return max(
+        CODE_CHUNK_MIN_TOKENS,
+        int(LLM_CONTEXT_TOKENS * LLM_CONTEXT_SAFETY_MARGIN)
+        - sum(count_tokens(str(text)) for text in prompt_texts)
+        - reserved_tokens
+        - LLM_RESPONSE_TOKEN_ESTIMATE,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_code_chunk_token_budget():
+    """Tokens left for code in a code level prompt, after the prompt itself,
+    a chunk of best practices and the response."""
+    return get_code_token_budget(
+        CODE_LEVEL_PROMPT, reserved_tokens=CODE_CHUNK_PRACTICE_TOKEN_RESERVE
+    )
+
+
+class CodeChunker:
+    """Splits a file into chunks which fit in a token budget.
+
+    Python files are split at statement boundaries from the ast, a too large
+    class or function is split along its body. Other languages, and Python
+    which does not parse, are split at blank line separated blocks of the
+    same indentation. Units are packed into chunks in file order and every
+    chunk keeps its original line numbers.
+    """
+
+    def __init__(self, path, lines, token_budget=None):
+        self.path = path
+        self.lines = lines
+        self.token_budget = token_budget or get_code_chunk_token_budget()
+        self.token_offsets = [0] + list(
+            accumulate(count_tokens(line) if line.strip() else 0 for line in lines)
+        )
+
+    def _tokens(self, start, end):
+        return self.token_offsets[end] - self.token_offsets[start - 1]
+
+    def _is_blank(self, line_number):
+        return not self.lines[line_number - 1].strip()
+
+    def _indentation(self, line_number):
+        line = self.lines[line_number - 1]
+        return len(line) - len(line.lstrip())
+
+    def _line_units(self, start, end):
+        units = []
+        unit_start = start
+        for line_number in range(start, end + 1):
+            if line_number > unit_start and self._tokens(unit_start, line_number) > self.token_budget:
+                units.append((unit_start, line_number - 1))
+                unit_start = line_number
+        units.append((unit_start, end))
+        return units
+
+    def _indentation_units(self, start, end):
+        if self._tokens(start, end) <= self.token_budget:
+            return [(start, end)]
+
+        code_lines = [i for i in range(start + 1, end + 1) if not self._is_blank(i)]
+        for level in sorted({self._indentation(i) for i in code_lines}):
+            boundaries = [
+                i for i in code_lines
+                if self._indentation(i) == level and self._is_blank(i - 1)
+            ]
+            if boundaries:
+                units = []
+                for unit_start, unit_end in zip(
+                    [start] + boundaries, [b - 1 for b in boundaries] + [end]
+                ):
+                    units.extend(self._indentation_units(unit_start, unit_end))
+                return units
+        return self._line_units(start, end)
+
+    def _node_start(self, node, lower_bound):
+        start = min(
+            [node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]
+        )
+        # Comments right above a statement belong to it
+        while start - 1 > lower_bound and self.lines[start - 2].lstrip().startswith("#"):
+            start -= 1
+        return max(start, lower_bound)
+
+    def _node_units(self, nodes, start, end):
+        starts = [start] + [
+            self._node_start(node, start) for node in nodes[1:]
+        ]
+        ends = [s - 1 for s in starts[1:]] + [end]
+        units = []
+        for node, unit_start, unit_end in zip(nodes, starts, ends):
+            if unit_start <= unit_end:
+                units.extend(self._fit_node(node, unit_start, unit_end))
+        return units
+
+    def _fit_node(self, node, start, end):
+        if self._tokens(start, end) <= self.token_budget:
+            return [(start, end)]
+
+        body = getattr(node, "body", None)
+        if isinstance(body, list) and body:
+            body_start = self._node_start(body[0], start)
+            units = self._node_units(body, body_start, end)
+            # The header stays with the start of the body when both fit
+            if body_start > start:
+                if self._tokens(start, units[0][1]) <= self.token_budget:
+                    units[0] = (start, units[0][1])
+                else:
+                    units.insert(0, (start, body_start - 1))
+            return units
+        return self._indentation_units(start, end)
+
+    def get_units(self):
+        if not self.lines:
+            return []
+        if self.path.endswith(".py"):
+            try:
+                tree = ast.parse("".join(self.lines))
+                if tree.body:
+                    return self._node_units(tree.body, 1, len(self.lines))
+            except (SyntaxError, ValueError):
+                pass
+        return self._indentation_units(1, len(self.lines))
+
+    def chunk(self):
+        """Returns (first line number, last line number, non blank lines) per chunk"""
+        ranges = []
+        for start, end in self.get_units():
+            if ranges and self._tokens(ranges[-1][0], end) <= self.token_budget:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+
+        chunks = []
+        for start, end in ranges:
+            line_numbers = [i for i in range(start, end + 1) if not self._is_blank(i)]
+            if line_numbers:
+                chunks.append(
+                    (
+                        line_numbers[0],
+                        line_numbers[-1],
+                        [self.lines[i - 1] for i in line_numbers],
+                    )
+                )
+        return chunks
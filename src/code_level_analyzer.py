@@ -1,95 +1,193 @@
 from concurrent.futures import as_completed
+import os
 import re
-from langchain_core.runnables.config import ContextThreadPoolExecutor
-from langchain_community.vectorstores.faiss import FAISS
+import threading
 from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain.prompts import PromptTemplate
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from collections import defaultdict
+from collections import defaultdict, Counter
 
 from knowledge_db import DB
-from doc_db import DocumentationDB
+from result_writer import ResultWriter
+from doc_db import get_documentation_db
+from file_snapshot import FileSnapshotStore
+from code_chunker import CodeChunker, get_code_token_budget
+from reference_index import get_reference_index_store
+from single_flight import SingleFlight
+from llm_scheduler import LLMScheduler, estimate_tokens
+from llm_registry import get_prompt_chain, get_documents_chain
 from utils.logger_manager import CustomLogger
-from utils.utilities import extract_json, read_file, create_output_dict, extract_list
+from utils.utilities import (
+    extract_json,
+    create_output_dict,
+    extract_list,
+    clean_text,
+    create_hash,
+)
 from utils.constants import (
     BEST_PRACTICES_CHUNK_SIZE,
-    MAX_FILES_PROCESS_CONCURRENTLY,
-    MAX_CHUNKS_PROCESS_CONCURRENTLY,
     LOG_FILE_PATH,
-    FILE_THREAD_PREFIX,
-    CHUNK_THREAD_PREFIX,
+    LLM_PRIORITY_ANALYSIS,
+    LLM_PRIORITY_FOLLOW_UP,
     STATEMENT_KEYWORD_PATTERN,
-    CODE_LINES_CHUNK_SIZE,
-    DOCUMENTATION_SPLIT_MODEL,
-    DOCUMENTATION_CHUNK_OVERLAP,
-    DOCUMENTATION_CHUNK_TOKEN_LIMIT,
     CODE_LEVEL_PROMPT,
     UNKNOWN_RESPONSE_PROMPT,
     SYSTEM_PROMPT,
     MODEL_NAME,
-    EMBEDING_MODEL,
-    AI71_BASE_URL
 )
 
 class CodeAnalyzer:
 
     def __init__(
-        self, project_frameworks, file_practice_mapping, processed_best_practice_dict_list
+        self,
+        project_frameworks,
+        file_practice_mapping,
+        processed_best_practice_dict_list,
+        changed_files=None,
+        changed_line_ranges=None,
+        snapshot_store=None,
+        practice_line_ranges=None,
+        root_path=None,
     ):
         self.project_frameworks = project_frameworks
         self.file_practice_mapping = file_practice_mapping
         self.best_practice_keyword_dict = processed_best_practice_dict_list
+        # In incremental mode only changed files go to the LLM, the others
+        # are answered from the knowledge store alone.
+        self.changed_files = changed_files
+        self.changed_line_ranges = changed_line_ranges
+        self.partially_analyzed_files = set()
+        # Matched line ranges per file and practice key from the file filter,
+        # a chunk is only sent with the practices matched inside it.
+        self.practice_line_ranges = practice_line_ranges
+        # Chunk cache keys name files relative to the analyzed folder
+        self.root_path = root_path
+        self.snapshot_store = snapshot_store or FileSnapshotStore()
+        self.file_chunks = {}
+        self.practice_hashes = {}
+        self.knowledge_store_responses = None
+        self.result_writer = None
+        # Practice contexts are retrieved at most once per run, concurrent
+        # Unknown verdicts of the same practice wait for the same retrieval.
+        self.unknown_contexts = SingleFlight()
+        self.unknown_lock = threading.Lock()
+        # Cached chunk verdicts are only reused for the same model, prompt and frameworks
+        self.response_version = create_hash(
+            f"{MODEL_NAME}\n{CODE_LEVEL_PROMPT}\n{project_frameworks}"
+        )
         self.db_store = DB()
         self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
 
-    def split_file_by_code_lines_limit(self, input_file_path: str, allowed_lines_per_file: int):
-        with open(input_file_path, "r") as file:
-            lines = file.readlines()
+    def split_file_into_chunks(self, input_file_path: str, token_budget=None):
+        key = (input_file_path, token_budget)
+        if key not in self.file_chunks:
+            self.file_chunks[key] = CodeChunker(
+                input_file_path,
+                self.snapshot_store.get_lines(input_file_path),
+                token_budget=token_budget,
+            ).chunk()
+        return self.file_chunks[key]
+
+    def split_file_for_unknown_response(self, code_file, best_practice, context):
+        # The retrieved context shares the prompt with the code, so the
+        # chunks of every practice get their own budget.
+        return self.split_file_into_chunks(
+            code_file,
+            get_code_token_budget(UNKNOWN_RESPONSE_PROMPT, context, best_practice),
+        )
 
-        non_empty_lines = [line for line in lines if line.strip()]
-        contents = []
-        for i in range(0, len(non_empty_lines), allowed_lines_per_file):
-            contents.append(non_empty_lines[i : i + allowed_lines_per_file])
-        return contents
+    def get_chunks_to_analyze(self, file_path):
+        all_chunks = self.split_file_into_chunks(file_path)
+        if self.changed_line_ranges is None:
+            return all_chunks
+
+        changed_ranges = self.changed_line_ranges.get(file_path, [])
+        chunks = [
+            (start, end, lines)
+            for start, end, lines in all_chunks
+            if any(start <= changed_end and changed_start <= end
+                   for changed_start, changed_end in changed_ranges)
+        ]
+        if len(chunks) != len(all_chunks):
+            # Verdicts of a partly analyzed file must not be cached for the whole file.
+            self.partially_analyzed_files.add(file_path)
+        return chunks
+
+    def get_chunk_practices(self, file_path, start, end, best_practices):
+        if self.practice_line_ranges is None:
+            return best_practices
+
+        file_line_ranges = self.practice_line_ranges.get(file_path, {})
+        chunk_practices = []
+        for best_practice in best_practices:
+            found = re.search(STATEMENT_KEYWORD_PATTERN, best_practice, re.DOTALL)
+            line_ranges = file_line_ranges.get(found.group(2).strip()) if found else None
+            # Practices without recorded matches are kept for every chunk
+            if line_ranges is None or any(
+                start <= match_end and match_start <= end
+                for match_start, match_end in line_ranges
+            ):
+                chunk_practices.append(best_practice)
+        return chunk_practices
 
     def combine_chunk_responses(self, curr_response, processed_response):
         for kw in processed_response:
             if kw in curr_response:
-                curr_response[STATEMENT_KEYWORD_PATTERN].extend(processed_response[kw])
+                curr_response[kw].extend(processed_response[kw])
             else:
                 curr_response[kw] = processed_response[kw]
 
-    def query_existing_data_in_knowledge_store(self, best_practices_list, file_path_str, old_responses):
-        code = read_file(file_path_str)
-        found_best_practice = []
-        for best_practice in best_practices_list:
+    def _get_practice_hash(self, best_practice):
+        """Returns (keyword, best practice hash) of the practice, parsed once per run"""
+        if best_practice not in self.practice_hashes:
+            found = re.search(STATEMENT_KEYWORD_PATTERN, best_practice, re.DOTALL)
+            self.practice_hashes[best_practice] = (
+                (found.group(2).strip(), create_hash(clean_text(found.group(1).strip())))
+                if found
+                else None
+            )
+        return self.practice_hashes[best_practice]
+
+    def prefetch_knowledge_store_responses(self):
+        """Fetches the cached verdicts of every (file, best practice) pair of the
+        run in a few bulk queries, each file is hashed once from its snapshot."""
+        file_practice_hashes = set()
+        for file_path, best_practices in self.file_practice_mapping.items():
             try:
-                found = re.search(STATEMENT_KEYWORD_PATTERN, best_practice, re.DOTALL)
-                if found:
-                    statement, keyword = found.groups()
-                    statement = statement.strip()
-                    keyword = keyword.strip()
-                    res = self.db_store.query_file(code, statement)
-
-                    if res:
-                        if file_path_str not in old_responses:
-                            old_responses[file_path_str] = {}
-                        old_responses[file_path_str][keyword] = res
-                        found_best_practice.append(best_practice)
-                        self.logger.info(
-                            f"Found exisitng response for {best_practice} in knowledge store"
-                        )
+                file_hash = self.snapshot_store.get_hash(file_path)
             except Exception as e:
-                self.logger.error(f"Error in querying knowledge store or response is not found in knowledge store: {str(e)}")
+                self.logger.error(f"Error while hashing {file_path}: {str(e)}")
+                continue
+            for best_practice in best_practices:
+                practice_hash = self._get_practice_hash(best_practice)
+                if practice_hash:
+                    file_practice_hashes.add((file_hash, practice_hash[1]))
+        self.knowledge_store_responses = self.db_store.query_files_by_hash(
+            file_practice_hashes
+        )
+        self.logger.info(
+            f"Found {len(self.knowledge_store_responses)} existing responses in knowledge store"
+        )
+
+    def query_existing_data_in_knowledge_store(self, best_practices_list, file_path_str, old_responses):
+        if self.knowledge_store_responses is None:
+            self.prefetch_knowledge_store_responses()
 
         remaining_best_practice = []
-        for i in range(len(best_practices_list)):
-            best_practice = best_practices_list[i]
-            if best_practice not in found_best_practice:
+        try:
+            file_hash = self.snapshot_store.get_hash(file_path_str)
+        except Exception as e:
+            self.logger.error(f"Error in querying knowledge store for {file_path_str}: {str(e)}")
+            return list(best_practices_list)
+
+        for best_practice in best_practices_list:
+            practice_hash = self._get_practice_hash(best_practice)
+            res = (
+                self.knowledge_store_responses.get((file_hash, practice_hash[1]))
+                if practice_hash
+                else None
+            )
+            if res:
+                old_responses.setdefault(file_path_str, {})[practice_hash[0]] = res
+            else:
                 remaining_best_practice.append(best_practice)
 
         return remaining_best_practice
@@ -120,109 +218,249 @@ class CodeAnalyzer:
             self.logger.error(f"Error while combing old and new response: {str(e)}")
             return {}
 
+    def get_analysis_requests(self, old_responses):
+        """Answers what it can from the knowledge store and returns the
+        (file path, code chunk, best practice chunk) requests left for the LLM."""
+        self.prefetch_knowledge_store_responses()
+        requests = []
+        for file_path, best_practices in self.file_practice_mapping.items():
+            remaining_best_practices = self.query_existing_data_in_knowledge_store(
+                best_practices, file_path, old_responses
+            )
+            if not len(remaining_best_practices):
+                continue
+            if self.changed_files is not None and file_path not in self.changed_files:
+                continue
+
+            for start, end, each_file_chunk in self.get_chunks_to_analyze(file_path):
+                chunk_practices = self.get_chunk_practices(
+                    file_path, start, end, remaining_best_practices
+                )
+                for best_practice_chunk in self._chunk_best_practices(chunk_practices):
+                    requests.append((file_path, each_file_chunk, best_practice_chunk))
+        return requests
+
+    def _get_practice_statements(self, best_practice_chunk):
+        statements = {}
+        for best_practice in best_practice_chunk:
+            found = re.search(STATEMENT_KEYWORD_PATTERN, best_practice, re.DOTALL)
+            if found:
+                statements[found.group(2).strip()] = clean_text(found.group(1))
+        return statements
+
+    def get_chunk_cache_key(self, file_path, code_chunk, best_practice_chunk):
+        statements = sorted(self._get_practice_statements(best_practice_chunk).values())
+        # The prompt names the file, so identical code in another file is
+        # another key. The analyzed folder is left out, a clone lives in a new
+        # temporary folder on every run.
+        relative_path = (
+            os.path.relpath(file_path, self.root_path) if self.root_path else file_path
+        )
+        return (
+            create_hash(f"{relative_path}\n{clean_text(''.join(code_chunk))}"),
+            create_hash("\n".join(statements)),
+            self.response_version,
+        )
+
+    def split_cached_requests(self, requests):
+        """Returns the (file path, response) of the requests answered from the
+        chunk cache and the requests left for the LLM."""
+        if not requests:
+            return [], []
+        cache_keys = [
+            self.get_chunk_cache_key(file_path, each_file_chunk, best_practice_chunk)
+            for file_path, each_file_chunk, best_practice_chunk in requests
+        ]
+        cached_chunk_responses = self.db_store.get_chunk_responses(cache_keys)
+
+        cached_responses = []
+        remaining_requests = []
+        for request, cache_key in zip(requests, cache_keys):
+            file_path, _, best_practice_chunk = request
+            if cache_key not in cached_chunk_responses:
+                remaining_requests.append(request)
+                continue
+            # Cached verdicts are stored by statement, keywords differ between runs
+            keywords = {
+                statement: keyword
+                for keyword, statement in self._get_practice_statements(
+                    best_practice_chunk
+                ).items()
+            }
+            cached_responses.append(
+                (
+                    file_path,
+                    {
+                        keywords[statement]: verdicts
+                        for statement, verdicts in cached_chunk_responses[cache_key].items()
+                        if statement in keywords
+                    },
+                )
+            )
+        self.logger.info(
+            f"Found {len(cached_responses)} of {len(requests)} chunk responses in knowledge store"
+        )
+        return cached_responses, remaining_requests
+
+    def store_chunk_responses(self, completed_requests):
+        chunk_responses = {}
+        for (file_path, each_file_chunk, best_practice_chunk), response in completed_requests:
+            statements = self._get_practice_statements(best_practice_chunk)
+            statement_response = {
+                statements[keyword]: verdicts
+                for keyword, verdicts in response.items()
+                if keyword in statements
+            }
+            # An empty response is a failed call, it is not cached
+            if statement_response:
+                chunk_responses[
+                    self.get_chunk_cache_key(file_path, each_file_chunk, best_practice_chunk)
+                ] = statement_response
+        if not chunk_responses:
+            return
+        if self.result_writer:
+            self.result_writer.add_chunk_responses(chunk_responses)
+        else:
+            self.db_store.add_chunk_responses(chunk_responses)
+
+    def store_new_responses(self, new_responses):
+        file_responses = {}
+        for file_path in new_responses:
+            if file_path in self.partially_analyzed_files:
+                continue
+            try:
+                file_hash = self.snapshot_store.get_hash(file_path)
+            except Exception as e:
+                self.logger.error(f"Error while hashing {file_path} to store its responses: {str(e)}")
+                continue
+            for best_practice_keyword in new_responses[file_path]:
+                try:
+                    best_practice_statement = self.best_practice_keyword_dict[
+                        best_practice_keyword
+                    ]["statement"]
+                    file_responses[
+                        (file_hash, create_hash(clean_text(best_practice_statement)))
+                    ] = new_responses[file_path][best_practice_keyword]
+                except Exception as e:
+                    self.logger.error(
+                        f"Error while storing {file_path} with best practice {best_practice_keyword} in db store: {str(e)}"
+                    )
+        if not file_responses:
+            return
+        if self.result_writer:
+            self.result_writer.add_file_responses(file_responses)
+        else:
+            self.db_store.add_file_responses(file_responses)
+
+    def store_completed_file(self, file_path, new_responses, unknown_handled_practices, stored_files):
+        """Stores the verdicts of a file once all of its chunks are answered,
+        unless some of them wait for the unknown response phase."""
+        if file_path in stored_files or any(
+            unknown_file_path == file_path for _, unknown_file_path in unknown_handled_practices
+        ):
+            return
+        stored_files.add(file_path)
+        self.store_new_responses({file_path: new_responses.get(file_path, {})})
+
+    def store_remaining_files(self, new_responses, stored_files):
+        self.store_new_responses(
+            {
+                file_path: responses
+                for file_path, responses in new_responses.items()
+                if file_path not in stored_files
+            }
+        )
+
     def execute_file_analyze(self):
         old_responses = {}
         final_response={}
+        # Results are stored in the background as soon as they are final
+        self.result_writer = ResultWriter()
         try:
-            with ContextThreadPoolExecutor(
-                max_workers=MAX_FILES_PROCESS_CONCURRENTLY,
-                thread_name_prefix=FILE_THREAD_PREFIX,
-            ) as executor:
-                future_to_file = {}
-                for file_path, best_practices in self.file_practice_mapping.items():
-                    remaining_best_practices = self.query_existing_data_in_knowledge_store(
-                        best_practices, file_path, old_responses
+            # Every chunk and practice chunk pair is one leaf call on the
+            # shared scheduler, so no analysis thread waits on another one.
+            scheduler = LLMScheduler()
+            cached_responses, requests = self.split_cached_requests(
+                self.get_analysis_requests(old_responses)
+            )
+            future_to_request = {
+                scheduler.submit(
+                    self.analyze_chunk,
+                    each_file_chunk,
+                    file_path,
+                    best_practice_chunk,
+                    priority=LLM_PRIORITY_ANALYSIS,
+                    tokens=estimate_tokens(
+                        CODE_LEVEL_PROMPT, each_file_chunk, best_practice_chunk
+                    ),
+                ): (file_path, each_file_chunk, best_practice_chunk)
+                for file_path, each_file_chunk, best_practice_chunk in requests
+            }
+            pending_requests = Counter(file_path for file_path, _, _ in requests)
+            unknown_handled_practices = set()
+            new_responses = {}
+            stored_files = set()
+            for file_path, response in cached_responses:
+                if file_path not in new_responses:
+                    new_responses[file_path] = {}
+                self.combine_chunk_responses(
+                    new_responses[file_path], self._handle_unknown_responses(
+                        response, file_path, unknown_handled_practices
                     )
-                    if not len(remaining_best_practices):
-                        continue
-
-                    all_chunks = self.split_file_by_code_lines_limit(file_path, CODE_LINES_CHUNK_SIZE)
-                    for each_file_chunk in all_chunks:
-                        future_to_file[
-                            executor.submit(
-                                self.analyze_file_chunk_concurrently,
-                                each_file_chunk,
-                                file_path,
-                                remaining_best_practices,
-                            )
-                        ] = file_path
-                unknown_handled_practices = []
-                new_responses = {}
-                for future in as_completed(future_to_file):
-                    file_path = future_to_file[future]
-                    try:
-                        response = future.result()
-                        if file_path not in new_responses:
-                            new_responses[file_path] = {}
-                        self.combine_chunk_responses(
-                            new_responses[file_path], self._handle_unknown_responses(
-                                response, file_path, unknown_handled_practices
-                            )
-                        )
-                    except Exception as exc:
-                        self.logger.error(
-                            f"File analysis failed for {file_path}: {exc}"
-                        )
+                )
             for file_path in new_responses:
-                for best_practice_keyword in new_responses[file_path]:
-                    try:
-                        best_practice_statement = self.best_practice_keyword_dict[
-                            best_practice_keyword
-                        ]["statement"]
-                        file_content = read_file(file_path)
-                        self.db_store.insert_file(
-                            file_content,
-                            best_practice_statement,
-                            new_responses[file_path][best_practice_keyword],
-                        )
-                    except Exception as e:
-                        self.logger.error(
-                            f"Error while storing {file_path} with best practice {best_practice_statement} in db store: {str(e)}"
+                if not pending_requests[file_path]:
+                    self.store_completed_file(
+                        file_path, new_responses, unknown_handled_practices, stored_files
+                    )
+            for future in as_completed(future_to_request):
+                file_path = future_to_request[future][0]
+                try:
+                    response = future.result()
+                    self.store_chunk_responses([(future_to_request[future], response)])
+                    if file_path not in new_responses:
+                        new_responses[file_path] = {}
+                    self.combine_chunk_responses(
+                        new_responses[file_path], self._handle_unknown_responses(
+                            response, file_path, unknown_handled_practices
                         )
+                    )
+                except Exception as exc:
+                    self.logger.error(
+                        f"File analysis failed for {file_path}: {exc}"
+                    )
+                pending_requests[file_path] -= 1
+                if not pending_requests[file_path] and file_path in new_responses:
+                    self.store_completed_file(
+                        file_path, new_responses, unknown_handled_practices, stored_files
+                    )
+
+            unknown_responses = self._handle_unknown_responses2(unknown_handled_practices)
+            for (keyword, file_path), responses in unknown_responses.items():
+                new_responses[file_path].setdefault(keyword, []).extend(responses)
+
+            self.store_remaining_files(new_responses, stored_files)
             final_response = self.combine_responses_into_final_response(old_responses, new_responses)
         except Exception as e:
-            self.logger.error(f"Threading failed: {e}")
+            self.logger.error(f"Code level analysis failed: {e}")
+        finally:
+            self.result_writer.close()
+            self.result_writer = None
 
         self.logger.info("Code level analysis completed.")
         return final_response
 
-    def analyze_file_chunk_concurrently(self, file_chunk_str, file_path_str, best_practices_list):
-        combined_data = {}
-        try:
-            with ContextThreadPoolExecutor(
-                max_workers=MAX_CHUNKS_PROCESS_CONCURRENTLY,
-                thread_name_prefix=CHUNK_THREAD_PREFIX,
-            ) as executor:
-                futures = [
-                    executor.submit(self.analyze_chunk, file_chunk_str, file_path_str, chunk)
-                    for chunk in self._chunk_best_practices(best_practices_list)
-                ]
-                for future in as_completed(futures):
-                    try:
-                        chunk_result = future.result()
-                        combined_data.update(chunk_result)
-                    except Exception as exc:
-                        self.logger.error(
-                            f"Chunk analysis failed for {file_path_str}: {exc}"
-                        )
-        except Exception as e:
-            self.logger.error(f"Chunk thread pool setup failed for {file_path_str}: {e}")
-        return combined_data
+    def get_code_level_chain(self):
+        return get_prompt_chain(
+            CODE_LEVEL_PROMPT,
+            ["best_practices", "project_frameworks", "file_path", "code"],
+            temperature=0,
+        )
 
     def analyze_chunk(self, code_chunk, file_path, best_practice_chunk):
         try:
             final_res = {}
-            model = ChatOpenAI(
-                temperature = 0, 
-                model_name = MODEL_NAME,
-                base_url=AI71_BASE_URL
-            )
-            
-            prompt_template = PromptTemplate(
-                template=CODE_LEVEL_PROMPT,
-                input_variables=["best_practices", "project_frameworks", "file_path", "code"],
-            )
-            chain = prompt_template | model
+            chain = self.get_code_level_chain()
             result = chain.invoke(
                 {
                     "best_practices": best_practice_chunk, 
@@ -257,53 +495,25 @@ class CodeAnalyzer:
         return formatted_res
 
     def _handle_unknown_responses(self, response, file_path, unknown_handled_practices):
+        # Unknown verdicts are resolved after every chunk is analyzed, once
+        # per practice and file.
         new_response = {}
         for keyword, values in response.items():
             if keyword not in new_response:
                 new_response[keyword] = []
             for value in values:
-                if (
-                    value["status"] == "Unknown"
-                    and [keyword, file_path] not in unknown_handled_practices
-                ):
-                    best_practice = self.best_practice_keyword_dict[keyword]
-                    new_response[keyword].append(
-                        self._handle_unknown_responses2(best_practice, file_path)
-                    )
-                    unknown_handled_practices.append([keyword, file_path])
-                    self.logger.info(f"Handled unknown response for: {best_practice}")
-                elif value["status"] != "Unknown":
+                if value["status"] == "Unknown":
+                    with self.unknown_lock:
+                        unknown_handled_practices.add((keyword, file_path))
+                else:
                     new_response[keyword].append(value)
         return new_response
 
     def _get_best_practice_context(self, best_practice):
-        loader = WebBaseLoader(best_practice["reference"])
-        response_docs = loader.load()
-
-        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-                model_name=DOCUMENTATION_SPLIT_MODEL,
-                chunk_size=DOCUMENTATION_CHUNK_TOKEN_LIMIT,
-                chunk_overlap=DOCUMENTATION_CHUNK_OVERLAP,
-            )
-        response_docs = text_splitter.split_documents(response_docs)
-
-        embeddings = OpenAIEmbeddings(model= EMBEDING_MODEL, dimensions= 768)
-        
-        vector_store = FAISS.from_documents(response_docs, embeddings)
+        vector_store = get_reference_index_store().get_index(best_practice["reference"])
         retriever = vector_store.as_retriever()
 
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", SYSTEM_PROMPT),
-                ("human", "{input}"),
-            ]
-        )
-        llm = ChatOpenAI(
-            temperature = 0, 
-            model_name = MODEL_NAME, 
-            base_url=AI71_BASE_URL
-        )
-        question_answer_chain = create_stuff_documents_chain(llm, prompt)
+        question_answer_chain = get_documents_chain(temperature=0)
         chain = create_retrieval_chain(retriever, question_answer_chain)
         solution = ""
         try:
@@ -315,53 +525,90 @@ class CodeAnalyzer:
             self.logger.error(str(ex))
         return solution
 
-    def _handle_unknown_responses2(self, best_practice,code_file):
+    def _get_unknown_context(self, best_practice):
+        return self.unknown_contexts.do(
+            (best_practice["statement"], best_practice["reference"]),
+            self._retrieve_unknown_context,
+            best_practice,
+        )
+
+    def _retrieve_unknown_context(self, best_practice):
         if not best_practice["reference"]:
             self.logger.info(
                 f"Checking best_practice: {best_practice} in documentation db"
             )
+            context = get_documentation_db().query(best_practice["statement"])
+            self.logger.info("Got context from documentation db")
+            return context
+        return self._get_best_practice_context(best_practice)
+
+    def _handle_unknown_responses2(self, unknown_practices):
+        """Resolves the Unknown verdicts in two phases, the practice contexts
+        first and then the code chunks which need them. Both phases only
+        submit leaf calls to the scheduler."""
+        scheduler = LLMScheduler()
+        unknown_practices = sorted(unknown_practices)
+        context_futures = {
+            keyword: scheduler.submit(
+                self._get_unknown_context,
+                self.best_practice_keyword_dict[keyword],
+                priority=LLM_PRIORITY_FOLLOW_UP,
+                tokens=estimate_tokens(
+                    SYSTEM_PROMPT, self.best_practice_keyword_dict[keyword]["statement"]
+                ),
+            )
+            for keyword in {keyword for keyword, _ in unknown_practices}
+        }
+
+        unknown_responses = {}
+        chunk_futures = {}
+        for keyword, code_file in unknown_practices:
+            best_practice = self.best_practice_keyword_dict[keyword]
             try:
-                context = DocumentationDB().query(best_practice["statement"])
-                self.logger.info("Got context from documentation db")
+                context = context_futures[keyword].result()
             except Exception as ex:
                 self.logger.error(str(ex))
-                return [{"status": "Skipped"}]
-        else:
-            context = self._get_best_practice_context(best_practice)
-
-        self.logger.info(f"Splitting code_file: {code_file} for analyzing unknown response")
-        all_chunks = self.split_file_by_code_lines_limit(code_file, 50)
-
-        with ContextThreadPoolExecutor(
-                max_workers=MAX_CHUNKS_PROCESS_CONCURRENTLY,
-                thread_name_prefix=CHUNK_THREAD_PREFIX,
-            ) as executor:
-                futures = []
-                for chunk in all_chunks:
-                    futures.append(
-                        executor.submit(self._handle_unknown_responses3, best_practice, context, chunk, code_file)
-                    )
-                combined_results = []
-                for future in as_completed(futures):
-                    try:
-                        chunk_result = future.result()
-                        combined_results.extend(chunk_result)
-                    except Exception as exc:
-                        self.logger.error(str(exc))
-        return combined_results
+                unknown_responses[(keyword, code_file)] = [{"status": "Skipped"}]
+                continue
+
+            self.logger.info(f"Splitting code_file: {code_file} for analyzing unknown response")
+            chunk_futures[(keyword, code_file)] = [
+                scheduler.submit(
+                    self._handle_unknown_responses3,
+                    best_practice,
+                    context,
+                    chunk,
+                    code_file,
+                    priority=LLM_PRIORITY_FOLLOW_UP,
+                    tokens=estimate_tokens(
+                        UNKNOWN_RESPONSE_PROMPT, context, chunk, best_practice
+                    ),
+                )
+                for _, _, chunk in self.split_file_for_unknown_response(
+                    code_file, best_practice, context
+                )
+            ]
 
-    def _handle_unknown_responses3(self, best_practice, context, file_content, code_file):
-        
-        model = ChatOpenAI(
-            temperature = 0, 
-            model_name = MODEL_NAME, 
-            base_url=AI71_BASE_URL
+        for unknown_practice, futures in chunk_futures.items():
+            combined_results = []
+            for future in futures:
+                try:
+                    combined_results.extend(future.result())
+                except Exception as exc:
+                    self.logger.error(str(exc))
+            unknown_responses[unknown_practice] = combined_results
+            self.logger.info(f"Handled unknown response for: {unknown_practice[0]}")
+        return unknown_responses
+
+    def get_unknown_response_chain(self):
+        return get_prompt_chain(
+            UNKNOWN_RESPONSE_PROMPT,
+            ["file_path", "context", "code", "best_practice"],
+            temperature=0,
         )
-        prompt_template = PromptTemplate(
-            template=UNKNOWN_RESPONSE_PROMPT,
-            input_variables=["file_path", "context", "code", "best_practice"],
-        )
-        chain = prompt_template | model
+
+    def _handle_unknown_responses3(self, best_practice, context, file_content, code_file):
+        chain = self.get_unknown_response_chain()
         response = chain.invoke(
             {
                 "file_path": code_file,
@@ -370,6 +617,9 @@ class CodeAnalyzer:
                 "best_practice": best_practice,
             }
         ).content
+        return self.parse_unknown_response(response)
+
+    def parse_unknown_response(self, response):
         try:
             response = extract_list(response)
             if not response or len(response) == 0:
@@ -2,30 +2,113 @@ import os
 import re
 import tempfile
 import subprocess
-import fnmatch
 import stat
 import shutil
+import hashlib
 from urllib.parse import urlparse
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
 from utils.constants import (
     FILE_EXTENSIONS,
-    MODEL_NAME,
-    AI71_BASE_URL,
-    FIND_FRAMEWORK_PROMPT
+    FIND_FRAMEWORK_PROMPT,
+    LLM_PRIORITY_SETUP,
+    REPO_MIRROR_FOLDER_PATH,
+    REPO_MIRROR_MAX_SIZE_BYTES,
+    REPO_SHALLOW_CLONE_DEPTH,
+    FRAMEWORK_MANIFEST_FILES,
+    STRUCTURE_IMPORTANT_FILES,
+    PROJECT_STRUCTURE_TOKEN_BUDGET,
 )
+from utils.exceptions import CloneRepositoryError, InvalidSourceCodeLinkError
+from repo_walker import RepoWalker
+from framework_detector import FrameworkDetector
+from knowledge_db import DB
+from llm_scheduler import LLMScheduler, estimate_tokens
+from llm_registry import get_prompt_chain
+from structure_summarizer import StructureSummarizer
 
 
+MIRROR_TEMP_FOLDER_PREFIX = ".tmp_"
+DIFF_HUNK_PATTERN = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+C_QUOTE_ESCAPES = {
+    "a": 7, "b": 8, "t": 9, "n": 10, "v": 11, "f": 12, "r": 13, '"': 34, "\\": 92,
+}
+
+
+def unquote_diff_path(path):
+    """Path of a diff header, without the tab git appends to paths with
+    spaces and with the C quoting of unusual characters undone."""
+    path = path.rstrip("\t")
+    if not (len(path) > 1 and path.startswith('"') and path.endswith('"')):
+        return path
+    quoted = path[1:-1]
+    unquoted = bytearray()
+    i = 0
+    while i < len(quoted):
+        char = quoted[i]
+        if char != "\\" or i + 1 == len(quoted):
+            unquoted.extend(char.encode("utf-8"))
+            i += 1
+        elif quoted[i + 1] in C_QUOTE_ESCAPES:
+            unquoted.append(C_QUOTE_ESCAPES[quoted[i + 1]])
+            i += 2
+        else:
+            # Octal escape of one byte of a UTF-8 sequence
+            unquoted.append(int(quoted[i + 1 : i + 4], 8))
+            i += 4
+    return unquoted.decode("utf-8", errors="replace")
+
+
+def parse_diff_line_ranges(diff_output):
+    """Returns {path: [(first line, last line)]} of the new side of a
+    --unified=0 diff, with the paths relative to the diff root."""
+    changed_line_ranges = {}
+    path = None
+    previous_line = ""
+    for line in diff_output.split("\n"):
+        # An added line starting with "++ " looks like a header, a real
+        # header always follows the "--- " line.
+        if line.startswith("+++ ") and previous_line.startswith("--- "):
+            header_path = unquote_diff_path(line[4:])
+            path = header_path[2:] if header_path.startswith("b/") else None
+        else:
+            match = DIFF_HUNK_PATTERN.match(line)
+            if match and path:
+                start = int(match.group(1))
+                length = int(match.group(2)) if match.group(2) is not None else 1
+                # Pure deletions have no new lines, keep the lines around them.
+                end = start + length - 1 if length else start + 1
+                changed_line_ranges.setdefault(path, []).append((max(start, 1), end))
+        previous_line = line
+    return changed_line_ranges
+
 
 class CodeLoader:
     def __init__(
-        self, code_link, username, password
+        self,
+        code_link,
+        username,
+        password,
+        use_mirror_cache=True,
+        shallow=False,
+        sparse=False,
+        structure_token_budget=PROJECT_STRUCTURE_TOKEN_BUDGET,
+        head_ref=None,
+        keep_history=False,
     ):
         self.code_link = code_link
         self.username = username
         self.password = password
+        self.use_mirror_cache = use_mirror_cache
+        self.head_ref = head_ref
+        # Diffing against a base ref needs the history, so it wins over shallow.
+        self.shallow = shallow and not keep_history
+        self.sparse = sparse
         self.is_clone = False
+        self.mirror_path = None
+        self.code_files = []
         self.project_structure = ""
+        self.structure_token_budget = structure_token_budget
+        self.structure_summary = ""
 
     def load_code_files(self):
         try:
@@ -40,70 +123,266 @@ class CodeLoader:
     def clone_repo(self):
         temp_dir_path = tempfile.mkdtemp()
         try:
-            parse_url = urlparse(self.code_link)
-            auth_url = f"{parse_url.scheme}://{self.username}:{self.password}@{parse_url.netloc}{parse_url.path}"
+            if self.use_mirror_cache:
+                self.mirror_path = self.update_mirror()
+                self.checkout_worktree(temp_dir_path)
+            else:
+                clone_command = (
+                    ["git"] + self._get_auth_config() + ["clone"]
+                    + self._get_depth_args()
+                    + [self.code_link, temp_dir_path]
+                )
+                self._run_git(clone_command)
+                if self.head_ref:
+                    self._run_git(
+                        ["git", "-C", temp_dir_path, "checkout", "--detach", self.head_ref]
+                    )
 
+            self.code_link = temp_dir_path
+            self.is_clone = True
+            return self.get_all_files()
+        except Exception as err:
+            # self.logger.error(err)
+            print(err)
 
-            clone_command = (
-                ["git", "clone"] +  [auth_url, temp_dir_path]
-            )
+    def _get_auth_config(self):
+        # Credentials are injected through an `insteadOf` rewrite so they never
+        # end up in the remote url stored inside the cached mirror.
+        if not self.username:
+            return []
+        parse_url = urlparse(self.code_link)
+        auth_url = f"{parse_url.scheme}://{self.username}:{self.password}@{parse_url.netloc}{parse_url.path}"
+        return ["-c", f"url.{auth_url}.insteadOf={self.code_link}"]
+
+    def _get_depth_args(self):
+        return ["--depth", str(REPO_SHALLOW_CLONE_DEPTH)] if self.shallow else []
+
+    def _get_unshallow_args(self, mirror_path):
+        # A mirror first cloned shallow needs its full history once a run
+        # diffs against a base ref or asks for a full clone.
+        if self.shallow:
+            return []
+        is_shallow = self._run_git(
+            ["git", "-C", mirror_path, "rev-parse", "--is-shallow-repository"]
+        ).stdout.strip()
+        return ["--unshallow"] if is_shallow == "true" else []
 
-            subprocess.run(
-                clone_command,
+    def _run_git(self, command):
+        try:
+            return subprocess.run(
+                command,
                 check=True,
                 capture_output=True,
                 text=True,
             )
+        except subprocess.CalledProcessError as err:
+            raise CloneRepositoryError(
+                f"Command '{' '.join(command[-3:])}' failed: {err.stderr.strip()}"
+            )
 
-            self.code_link = temp_dir_path
-            self.is_clone = True
-            return self.get_all_files()
-        except Exception as err:
-            # self.logger.error(err)
-            print(err)
+    def get_mirror_path(self):
+        repo_url = self.code_link.rstrip("/")
+        repo_hash = hashlib.sha256(repo_url.encode("utf-8")).hexdigest()
+        return os.path.join(REPO_MIRROR_FOLDER_PATH, f"{repo_hash}.git")
+
+    def update_mirror(self):
+        mirror_path = self.get_mirror_path()
+        if os.path.isdir(mirror_path):
+            fetch_command = (
+                ["git"] + self._get_auth_config()
+                + ["-C", mirror_path, "fetch", "--prune"]
+                + self._get_depth_args()
+                + self._get_unshallow_args(mirror_path)
+                + ["origin"]
+            )
+            self._run_git(fetch_command)
+        else:
+            os.makedirs(REPO_MIRROR_FOLDER_PATH, exist_ok=True)
+            # Cloned into a folder of this call and renamed into place, a
+            # failed or concurrent clone never removes another run's mirror.
+            clone_path = tempfile.mkdtemp(
+                prefix=MIRROR_TEMP_FOLDER_PREFIX, dir=REPO_MIRROR_FOLDER_PATH
+            )
+            clone_command = (
+                ["git"] + self._get_auth_config() + ["clone", "--mirror"]
+                + self._get_depth_args()
+                + [self.code_link, clone_path]
+            )
+            try:
+                self._run_git(clone_command)
+                os.rename(clone_path, mirror_path)
+            except OSError:
+                # Another run put its mirror in place first
+                if not os.path.isdir(mirror_path):
+                    raise
+            finally:
+                if os.path.isdir(clone_path):
+                    shutil.rmtree(clone_path, onerror=self.on_rm_error)
+
+        # Mirror mtime is used as the last access time for eviction.
+        os.utime(mirror_path)
+        self.evict_mirrors(keep=mirror_path)
+        return mirror_path
+
+    def checkout_worktree(self, worktree_path):
+        worktree_command = (
+            ["git", "-C", self.mirror_path, "worktree", "add", "--detach"]
+            + (["--no-checkout"] if self.sparse else [])
+            + [worktree_path, self.head_ref or "HEAD"]
+        )
+        self._run_git(worktree_command)
+
+        if self.sparse:
+            # Manifests and readmes are needed by framework detection and
+            # the structure summary.
+            patterns = [f"*{ext}" for ext in FILE_EXTENSIONS] + sorted(
+                set(FRAMEWORK_MANIFEST_FILES) | set(STRUCTURE_IMPORTANT_FILES)
+            )
+            self._run_git(
+                ["git", "-C", worktree_path, "sparse-checkout", "set", "--no-cone"]
+                + patterns
+            )
+            self._run_git(
+                ["git"] + self._get_auth_config()
+                + ["-C", worktree_path, "checkout", "--detach"]
+            )
+
+    def _get_folder_size(self, folder_path):
+        total_size = 0
+        for root, _, files in os.walk(folder_path):
+            for file in files:
+                try:
+                    total_size += os.path.getsize(os.path.join(root, file))
+                except OSError:
+                    continue
+        return total_size
+
+    def evict_mirrors(self, keep=None):
+        if not os.path.isdir(REPO_MIRROR_FOLDER_PATH):
+            return
+        mirrors = []
+        for item in os.listdir(REPO_MIRROR_FOLDER_PATH):
+            full_path = os.path.join(REPO_MIRROR_FOLDER_PATH, item)
+            # Clones in progress are not evicted
+            if os.path.isdir(full_path) and not item.startswith(MIRROR_TEMP_FOLDER_PREFIX):
+                mirrors.append(
+                    (os.path.getmtime(full_path), full_path, self._get_folder_size(full_path))
+                )
+
+        total_size = sum(size for _, _, size in mirrors)
+        for _, full_path, size in sorted(mirrors):
+            if total_size <= REPO_MIRROR_MAX_SIZE_BYTES:
+                break
+            if full_path == keep:
+                continue
+            shutil.rmtree(full_path, onerror=self.on_rm_error)
+            total_size -= size
 
     def get_all_files(self):
         try:
-            all_files = []
-            for root, _, files in os.walk(self.code_link):
-                for file in files:
-                    if any(file.endswith(ext) for ext in FILE_EXTENSIONS):
-                        all_files.append(os.path.join(root, file))
+            all_files, self.project_structure = RepoWalker(self.code_link).walk()
+            self.code_files = all_files
             return all_files
 
         except Exception as err:
             print(err)
             # self.logger.error(err)
 
-    def create_project_structure(self, folder_url, indentation_level=0):
-        project_structure = ""
-        for item in os.listdir(folder_url):
-            if not item.startswith("."):
-                full_path: str = os.path.join(folder_url, item)
-                if os.path.isdir(full_path):
-                    project_structure += "  " * indentation_level + f"/{item}\n"
-                    project_structure += self.create_project_structure(
-                        full_path, indentation_level + 1
-                    )
-                else:
-                    project_structure += "  " * indentation_level + f"|-- {item}\n"
+    def create_project_structure(self, folder_url):
+        _, project_structure = RepoWalker(folder_url).walk()
         return project_structure
 
+    def _check_head_ref(self, head_ref):
+        # A local folder is analyzed as it is on disk, its diff is only
+        # meaningful when the head ref is the checked out commit.
+        if self.is_clone:
+            return
+        head_commits = self._run_git(
+            ["git", "-C", self.code_link, "rev-parse", "HEAD", f"{head_ref}^{{commit}}"]
+        ).stdout.split()
+        if head_commits[0] != head_commits[1]:
+            raise InvalidSourceCodeLinkError(
+                f"Head ref '{head_ref}' is not checked out in {self.code_link}"
+            )
+
+    def get_changed_files(self, base_ref, head_ref):
+        self._check_head_ref(head_ref)
+        # --relative keeps the paths below code_link when it is a subfolder
+        # of the repository, -z keeps non-ASCII paths unquoted.
+        diff_output = self._run_git(
+            [
+                "git", "-C", self.code_link, "diff", "--name-only", "--relative", "-z",
+                "--diff-filter=ACMR", f"{base_ref}...{head_ref}",
+            ]
+        ).stdout
+        return {
+            os.path.join(self.code_link, path)
+            for path in diff_output.split("\0")
+            if path.strip()
+        }
+
+    def get_changed_line_ranges(self, base_ref, head_ref):
+        self._check_head_ref(head_ref)
+        diff_output = self._run_git(
+            [
+                "git", "-c", "core.quotePath=false", "-C", self.code_link, "diff",
+                "--unified=0", "--relative",
+                "--diff-filter=ACMR", f"{base_ref}...{head_ref}",
+            ]
+        ).stdout
+        return {
+            os.path.join(self.code_link, path): line_ranges
+            for path, line_ranges in parse_diff_line_ranges(diff_output).items()
+        }
+
+    def get_structure_summary(self):
+        if self.structure_summary:
+            return self.structure_summary
+        if not self.project_structure:
+            self.project_structure = self.create_project_structure(self.code_link)
+
+        # Summaries are cached by the walked structure itself. A commit does
+        # not identify it: a subfolder, uncommitted edits, a sparse checkout
+        # or other walker settings give another structure for the same commit.
+        source = self.project_structure
+        db = DB()
+        summary = db.get_structure_summary(source, self.structure_token_budget)
+        if summary is None:
+            summary = StructureSummarizer(
+                self.project_structure, self.structure_token_budget
+            ).summarize()
+            db.add_structure_summary(source, self.structure_token_budget, summary)
+        self.structure_summary = summary
+        return summary
+
     def get_project_framework(self):
-        self.project_structure = self.create_project_structure(self.code_link)
+        if not self.project_structure:
+            self.project_structure = self.create_project_structure(self.code_link)
 
-        model = ChatOpenAI(
-            model=MODEL_NAME,
-            base_url=AI71_BASE_URL,
-            streaming=True,
-        )
-        prompt_template = PromptTemplate(
-            template=FIND_FRAMEWORK_PROMPT,
-            input_variables=["project_structure"],
-        )
+        frameworks, is_ambiguous = FrameworkDetector(
+            self.code_link, self.code_files
+        ).detect()
+        if not is_ambiguous:
+            return frameworks
+
+        db = DB()
+        frameworks = db.get_framework(self.project_structure)
+        if frameworks is None:
+            frameworks = self.find_framework_with_llm()
+            db.add_framework(self.project_structure, frameworks)
+        return frameworks
 
-        chain = prompt_template | model
-        return chain.invoke({"project_structure": self.project_structure}).content
+    def find_framework_with_llm(self):
+        chain = get_prompt_chain(
+            FIND_FRAMEWORK_PROMPT, ["project_structure"], streaming=True
+        )
+        project_structure = self.get_structure_summary()
+        return LLMScheduler().submit(
+            chain.invoke,
+            {"project_structure": project_structure},
+            priority=LLM_PRIORITY_SETUP,
+            tokens=estimate_tokens(FIND_FRAMEWORK_PROMPT, project_structure),
+        ).result().content
 
     def on_rm_error(self, func, path, exc_info):
         os.chmod(path, stat.S_IWRITE)
@@ -113,5 +392,7 @@ class CodeLoader:
         if self.is_clone:
             try:
                 shutil.rmtree(self.code_link, onerror=self.on_rm_error)
+                if self.mirror_path:
+                    self._run_git(["git", "-C", self.mirror_path, "worktree", "prune"])
             except Exception as e:
                 raise e
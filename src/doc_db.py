@@ -1,50 +1,94 @@
 import os
+import pickle
+import threading
 
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_community.document_loaders import WebBaseLoader
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
+from llm_registry import get_embeddings, get_documents_chain
 from utils.logger_manager import CustomLogger
 from utils.constants import (
     INDEX_FOLDER_PATH,
     EMBEDING_MODEL,
+    EMBEDDING_DIMENSIONS,
     DOCUMENTATION_SPLIT_MODEL,
     DOCUMENTATION_CHUNK_OVERLAP,
     DOCUMENTATION_CHUNK_TOKEN_LIMIT,
     DOCUMENTATION_VECTOR_DB_NAME,
     SCHEDULAR_LOG_FILE_PATH,
-    MODEL_NAME,
-    AI71_BASE_URL,
-    SYSTEM_PROMPT,
-    SYSTEM_PROMPT
 )
 
+FAISS_INDEX_NAME = "index"  # File name used by FAISS.save_local
+
 URL = [
     "https://ibmsecuritydocs.github.io/qradar_appfw_v2/docs/tutorials/adding_csrf_protection.html"
 ]
 
+_documentation_dbs = {}
+_documentation_dbs_lock = threading.Lock()
+
+
+def get_documentation_db(index_name=DOCUMENTATION_VECTOR_DB_NAME):
+    """Returns the documentation index of the process, the index is opened on
+    its first query and shared read-only by every thread after that."""
+    with _documentation_dbs_lock:
+        if index_name not in _documentation_dbs:
+            _documentation_dbs[index_name] = DocumentationDB(index_name)
+        return _documentation_dbs[index_name]
+
+
 class DocumentationDB:
 
     def __init__(self, index_name=DOCUMENTATION_VECTOR_DB_NAME):
         self.logger = CustomLogger(SCHEDULAR_LOG_FILE_PATH).get_logger()
         self.index_folder_path = os.path.join(INDEX_FOLDER_PATH, index_name)
-        self.embedding = OpenAIEmbeddings(model= EMBEDING_MODEL, dimensions= 768)
-        self.db = self.get_db() 
-        if self.db is not None:
-            self.db.save_local(self.index_folder_path)
+        self.embedding = get_embeddings(EMBEDING_MODEL, EMBEDDING_DIMENSIONS)
+        self._db = None
+        self.modified = False
+        self.lock = threading.Lock()
+
+    @property
+    def db(self):
+        if self._db is None:
+            with self.lock:
+                if self._db is None:
+                    self._db = self.get_db()
+                    self.save_if_modified()
+        return self._db
+
+    def save_if_modified(self):
+        if self.modified:
+            self._db.save_local(self.index_folder_path)
+            self.modified = False
+
+    def _read_index(self, index_file_path):
+        faiss = dependable_faiss_import()
+        try:
+            # Memory mapped where the index type supports it, the pages are
+            # shared with other readers instead of copied per process.
+            return faiss.read_index(
+                index_file_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
+        except Exception:
+            return faiss.read_index(index_file_path)
+
+    def load_db(self):
+        index = self._read_index(
+            os.path.join(self.index_folder_path, f"{FAISS_INDEX_NAME}.faiss")
+        )
+        with open(
+            os.path.join(self.index_folder_path, f"{FAISS_INDEX_NAME}.pkl"), "rb"
+        ) as docstore_file:
+            docstore, index_to_docstore_id = pickle.load(docstore_file)
+        return FAISS(self.embedding, index, docstore, index_to_docstore_id)
 
     def get_db(self):
-        self.logger.info("Documentation DB already exists")
         if os.path.isdir(self.index_folder_path):
-            return FAISS.load_local(
-                self.index_folder_path,
-                self.embedding,
-                allow_dangerous_deserialization=True,
-            )
+            self.logger.info("Documentation DB already exists")
+            return self.load_db()
         else:
             if not len(URL):
                 raise Exception("No URL provided")
@@ -56,6 +100,7 @@ class DocumentationDB:
                 chunk_overlap=DOCUMENTATION_CHUNK_OVERLAP,
             )
             all_documents = text_splitter.split_documents(all_documents)
+            self.modified = True
             return FAISS.from_documents(all_documents, self.embedding)
 
     def query(self, query_string):
@@ -63,18 +108,7 @@ class DocumentationDB:
         if db_instance is None:
             raise Exception(f"Vector Database: {self.index_folder_path}, does not exists")
         retriever = db_instance.as_retriever()
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", SYSTEM_PROMPT),
-                ("human", "{input}"),
-            ]
-        )
-        model = ChatOpenAI(
-            temperature = 0, 
-            model_name = MODEL_NAME,
-            base_url=AI71_BASE_URL
-        )
-        question_answer = create_stuff_documents_chain(model, prompt)
+        question_answer = get_documents_chain(temperature=0)
         chain = create_retrieval_chain(retriever, question_answer)
 
         solution = ""
@@ -1,41 +1,323 @@
-from fuzzywuzzy import fuzz
+import os
+import math
+import multiprocessing
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
+from knowledge_db import DB
+from file_snapshot import FileSnapshotStore
+from code_chunker import CodeChunker
+from token_index import TokenIndex, create_token_signature
 from utils.logger_manager import CustomLogger
 from utils.constants import (
     LOG_FILE_PATH,
-    SIMILARITY_SEARCH_THRESHOLD,
+    PARALLEL_FILTER_MIN_FILES,
+    PARALLEL_FILTER_SHARDS_PER_WORKER,
+    FILTER_TOP_K_FILES_PER_PRACTICE,
+    FILTER_TOP_N_PRACTICES_PER_FILE,
+    LLM_CALL_BUDGET,
+    BEST_PRACTICES_CHUNK_SIZE,
+    KEYWORD_MATCH_CONTEXT_LINES,
 )
-from utils.utilities import read_file
+
+# Set once per worker process by the pool initializer
+_worker_practice_dict_list = None
+
+
+def _init_filter_worker(practice_dict_list):
+    global _worker_practice_dict_list
+    _worker_practice_dict_list = practice_dict_list
+
+
+def match_practices(token_index, practice_dict_list):
+    """Returns {path: [(practice key, statement, matched lines, {keyword: hits})]}
+    in practice order."""
+    matches = defaultdict(list)
+    for practice_dict in practice_dict_list:
+        for key, practice in practice_dict.items():
+            matched_files = defaultdict(set)
+            keyword_hits = defaultdict(dict)
+            for keyword in practice["keywords"]:
+                for path, line_numbers in token_index.match_keyword(keyword).items():
+                    matched_files[path].update(line_numbers)
+                    keyword_hits[path][keyword] = len(line_numbers)
+            for path in sorted(matched_files):
+                matches[path].append(
+                    (
+                        key,
+                        practice["statement"],
+                        sorted(matched_files[path]),
+                        keyword_hits[path],
+                    )
+                )
+    return matches
+
+
+def _filter_shard(shard):
+    # Items carry either a cached signature or the content to tokenize
+    token_index = TokenIndex()
+    new_signatures = {}
+    for path, file_hash, signature, content in shard:
+        if signature is None:
+            signature = create_token_signature(content)
+            new_signatures[file_hash] = signature
+        token_index.add_file(path, signature)
+    return dict(match_practices(token_index, _worker_practice_dict_list)), new_signatures
+
+
+def get_line_ranges(line_numbers, context_lines=KEYWORD_MATCH_CONTEXT_LINES):
+    """Merges matched line numbers, widened by the context lines, into
+    sorted (start, end) ranges."""
+    line_ranges = []
+    for line_number in line_numbers:
+        start = max(1, line_number - context_lines)
+        end = line_number + context_lines
+        if line_ranges and start <= line_ranges[-1][1] + 1:
+            line_ranges[-1] = (line_ranges[-1][0], max(line_ranges[-1][1], end))
+        else:
+            line_ranges.append((start, end))
+    return line_ranges
+
+
+def get_available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
 
 
 class FileFilter:
 
-    def __init__(self, files, practice_dict_list):
+    def __init__(
+        self,
+        files,
+        practice_dict_list,
+        snapshot_store=None,
+        parallel=None,
+        top_k_files=FILTER_TOP_K_FILES_PER_PRACTICE,
+        top_n_practices=FILTER_TOP_N_PRACTICES_PER_FILE,
+        llm_call_budget=LLM_CALL_BUDGET,
+        changed_files=None,
+    ):
         self.files = files
         self.practice_dict_list = practice_dict_list
+        self.snapshot_store = snapshot_store or FileSnapshotStore()
+        self.top_k_files = top_k_files
+        self.top_n_practices = top_n_practices
+        self.llm_call_budget = llm_call_budget
+        # Only files which go to the LLM are ranked, the others are answered
+        # from the knowledge store and cost no LLM call.
+        self.changed_files = changed_files
+        self.relevance_scores = {}
+        self.chunk_ranges = {}
+        # None picks the process pool for large repositories only
+        self.parallel = (
+            len(files) >= PARALLEL_FILTER_MIN_FILES if parallel is None else parallel
+        )
         self.filtered_files = defaultdict(list)
+        # {path: {practice key: [(start, end)]}} of the lines each practice matched
+        self.practice_line_ranges = defaultdict(dict)
+        self.token_index = TokenIndex()
+        self.db = DB()
         self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
 
-    def similarity_search(self, path, content):
-        for practice_dict in self.practice_dict_list:
-            for key, practice in practice_dict.items():
-                for keyword in practice["keywords"]:
-                    if (
-                        fuzz.token_set_ratio(content, keyword)
-                        >= SIMILARITY_SEARCH_THRESHOLD
-                    ):
-                        self.filtered_files[path].append(
-                            f'{practice["statement"]}\n[keyword_name: {key}]'
-                        )
-                        break
-
-    def read_files(self):
+    def get_file_hashes(self):
+        file_hashes = {}
         for file in self.files:
             try:
-                content = read_file(file)
-                self.similarity_search(file, content)
-                self.logger.info("Filtered files.")
+                file_hashes[file] = self.snapshot_store.get_content_hash(file)
             except Exception as e:
                 self.logger.error(f"Error while reading file: {file}: {str(e)}")
+        return file_hashes
+
+    def build_index(self, file_hashes, signatures):
+        # Token signatures are stored by the exact content hash, so unchanged
+        # files are never tokenized again. The normalized hash of the verdict
+        # caches would reuse the line numbers of a reformatted file.
+        new_signatures = {}
+        for file, file_hash in file_hashes.items():
+            signature = signatures.get(file_hash) or new_signatures.get(file_hash)
+            if signature is None:
+                signature = create_token_signature(self.snapshot_store.get_content(file))
+                new_signatures[file_hash] = signature
+            self.token_index.add_file(file, signature)
+        return new_signatures
+
+    def score_matches(self, matches):
+        # TF-IDF like score: rare keywords weigh more, repeated hits add
+        # logarithmically, normalized by the practice's keyword count.
+        document_frequency = defaultdict(int)
+        for path_matches in matches.values():
+            # A keyword shared by several practices still counts once per file
+            path_keywords = set()
+            for _, _, _, keyword_hits in path_matches:
+                path_keywords.update(keyword_hits)
+            for keyword in path_keywords:
+                document_frequency[keyword] += 1
+
+        practice_keyword_counts = {
+            key: max(1, len(practice["keywords"]))
+            for practice_dict in self.practice_dict_list
+            for key, practice in practice_dict.items()
+        }
+        total_files = max(1, len(matches))
+        for path, path_matches in matches.items():
+            for key, _, _, keyword_hits in path_matches:
+                score = sum(
+                    math.log(1 + total_files / document_frequency[keyword])
+                    * (1 + math.log(hits))
+                    for keyword, hits in keyword_hits.items()
+                )
+                self.relevance_scores[(path, key)] = score / math.sqrt(
+                    practice_keyword_counts.get(key, 1)
+                )
+
+    def get_matched_chunks(self, path, line_ranges):
+        """Returns the indexes of the code chunks of the file which overlap the
+        matched line ranges, the chunks the analysis sends the practice with."""
+        if path not in self.chunk_ranges:
+            self.chunk_ranges[path] = [
+                (start, end)
+                for start, end, _ in CodeChunker(
+                    path, self.snapshot_store.get_lines(path)
+                ).chunk()
+            ]
+        return [
+            index
+            for index, (start, end) in enumerate(self.chunk_ranges[path])
+            if any(
+                start <= match_end and match_start <= end
+                for match_start, match_end in line_ranges
+            )
+        ]
+
+    def select_pairs(self, matches):
+        ranked_pairs = [
+            (path, key)
+            for path in matches
+            if self.changed_files is None or path in self.changed_files
+            for key, _, _, _ in matches[path]
+        ]
+        # Ties are broken by path and key so both filter modes select the same pairs
+        ranked_pairs.sort(key=lambda pair: (-self.relevance_scores[pair], pair))
+
+        if self.top_k_files is not None:
+            files_per_practice = defaultdict(int)
+            kept_pairs = []
+            for path, key in ranked_pairs:
+                if files_per_practice[key] < self.top_k_files:
+                    files_per_practice[key] += 1
+                    kept_pairs.append((path, key))
+            ranked_pairs = kept_pairs
+
+        if self.top_n_practices is not None:
+            practices_per_file = defaultdict(int)
+            kept_pairs = []
+            for path, key in ranked_pairs:
+                if practices_per_file[path] < self.top_n_practices:
+                    practices_per_file[path] += 1
+                    kept_pairs.append((path, key))
+            ranked_pairs = kept_pairs
+
+        if self.llm_call_budget is not None:
+            # Greedy by score, a pair is kept when its extra calls still fit.
+            # Every chunk gets one call per BEST_PRACTICES_CHUNK_SIZE practices
+            # whose matched lines overlap it.
+            matched_lines = {
+                (path, key): lines
+                for path, path_matches in matches.items()
+                for key, _, lines, _ in path_matches
+            }
+            practices_per_chunk = defaultdict(int)
+            used_calls = 0
+            kept_pairs = []
+            for path, key in ranked_pairs:
+                chunk_indexes = self.get_matched_chunks(
+                    path, get_line_ranges(matched_lines[(path, key)])
+                )
+                extra_calls = sum(
+                    1
+                    for index in chunk_indexes
+                    if practices_per_chunk[(path, index)] % BEST_PRACTICES_CHUNK_SIZE == 0
+                )
+                if used_calls + extra_calls > self.llm_call_budget:
+                    continue
+                used_calls += extra_calls
+                for index in chunk_indexes:
+                    practices_per_chunk[(path, index)] += 1
+                kept_pairs.append((path, key))
+            ranked_pairs = kept_pairs
+            self.logger.info(
+                f"Estimated {used_calls} LLM calls for a budget of {self.llm_call_budget}"
+            )
+
+        return set(ranked_pairs)
+
+    def add_matches(self, matches):
+        self.score_matches(matches)
+        selected_pairs = self.select_pairs(matches)
+        for path in sorted(matches):
+            for key, statement, lines, _ in matches[path]:
+                is_ranked = self.changed_files is None or path in self.changed_files
+                if is_ranked and (path, key) not in selected_pairs:
+                    continue
+                self.filtered_files[path].append(f"{statement}\n[keyword_name: {key}]")
+                self.practice_line_ranges[path][key] = get_line_ranges(lines)
+        self.logger.info(
+            f"Selected {len(selected_pairs)} relevant file and practice pairs"
+        )
+
+    def similarity_search(self):
+        self.add_matches(match_practices(self.token_index, self.practice_dict_list))
+
+    def parallel_similarity_search(self, file_hashes, signatures):
+        workers = get_available_cpus()
+        items = [
+            (
+                file,
+                file_hash,
+                signatures.get(file_hash),
+                None if file_hash in signatures else self.snapshot_store.get_content(file),
+            )
+            for file, file_hash in file_hashes.items()
+        ]
+        shard_count = max(1, min(len(items), workers * PARALLEL_FILTER_SHARDS_PER_WORKER))
+        shards = [items[i::shard_count] for i in range(shard_count)]
+
+        matches = {}
+        new_signatures = {}
+        # Forking would copy the LLM scheduler threads and their locks into
+        # the workers, they start from a fresh interpreter instead.
+        start_method = (
+            "forkserver"
+            if "forkserver" in multiprocessing.get_all_start_methods()
+            else "spawn"
+        )
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_filter_worker,
+            initargs=(self.practice_dict_list,),
+        ) as executor:
+            for shard_matches, shard_signatures in executor.map(_filter_shard, shards):
+                matches.update(shard_matches)
+                new_signatures.update(shard_signatures)
+        self.add_matches(matches)
+        self.logger.info(f"Filtered files in {shard_count} shards on {workers} processes")
+        return new_signatures
+
+    def read_files(self):
+        file_hashes = self.get_file_hashes()
+        signatures = self.db.get_token_signatures(list(file_hashes.values())) or {}
+        if self.parallel:
+            new_signatures = self.parallel_similarity_search(file_hashes, signatures)
+        else:
+            new_signatures = self.build_index(file_hashes, signatures)
+            self.similarity_search()
+
+        if new_signatures:
+            self.db.add_token_signatures(new_signatures)
+        self.logger.info(
+            f"Filtered {len(file_hashes)} files, {len(new_signatures)} newly tokenized"
+        )
         return self.filtered_files
@@ -0,0 +1,62 @@
+import threading
+from functools import cached_property
+
+from utils.logger_manager import CustomLogger
+from utils.utilities import clean_text, create_hash
+from utils.constants import LOG_FILE_PATH
+
+
+class FileSnapshot:
+    def __init__(self, path, content):
+        self.path = path
+        self.content = content
+
+    @cached_property
+    def file_hash(self):
+        # Same normalization as the knowledge store uses for file entries
+        return create_hash(clean_text(self.content))
+
+    @cached_property
+    def content_hash(self):
+        # Exact content, for caches which depend on whitespace and line numbers
+        return create_hash(self.content)
+
+    @cached_property
+    def lines(self):
+        return self.content.splitlines(keepends=True)
+
+
+class FileSnapshotStore:
+    """Run scoped store which reads every file only once and shares its
+    content, hash and lines between the pipeline stages."""
+
+    def __init__(self):
+        self.snapshots = {}
+        self.lock = threading.Lock()
+        self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
+
+    def _read(self, path):
+        self.logger.info(f"Reading file: {path}")
+        with open(path, "r", encoding="utf-8") as file:
+            return file.read()
+
+    def get(self, path):
+        snapshot = self.snapshots.get(path)
+        if snapshot is not None:
+            return snapshot
+
+        snapshot = FileSnapshot(path, self._read(path))
+        with self.lock:
+            return self.snapshots.setdefault(path, snapshot)
+
+    def get_content(self, path):
+        return self.get(path).content
+
+    def get_hash(self, path):
+        return self.get(path).file_hash
+
+    def get_content_hash(self, path):
+        return self.get(path).content_hash
+
+    def get_lines(self, path):
+        return self.get(path).lines
@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import configparser
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from utils.logger_manager import CustomLogger
+from utils.constants import (
+    LOG_FILE_PATH,
+    FRAMEWORK_SIGNATURES,
+    EXTENSION_LANGUAGES,
+    FRAMEWORK_MANIFEST_SCORE,
+    FRAMEWORK_IMPORT_SCORE,
+    FRAMEWORK_IMPORT_SCAN_LIMIT,
+    MAX_DETECTED_FRAMEWORKS,
+)
+
+REQUIREMENT_NAME_PATTERN = re.compile(r"^\s*([A-Za-z0-9_.\-]+)")
+PYTHON_IMPORT_PATTERN = re.compile(r"^\s*(?:from|import)\s+([\w.]+)", re.MULTILINE)
+JAVA_IMPORT_PATTERN = re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+)", re.MULTILINE)
+JS_IMPORT_PATTERN = re.compile(r"(?:\bfrom|\brequire\()\s*['\"]([^'\"]+)['\"]")
+
+
+class FrameworkDetector:
+    """Detects project frameworks from manifests and import statements
+    without calling the LLM."""
+
+    def __init__(self, root_path, code_files=None):
+        self.root_path = root_path
+        self.code_files = code_files or []
+        self.scores = Counter()
+        self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
+
+    def _match_framework(self, dependency):
+        name = dependency.strip().lower()
+        for signature, framework in FRAMEWORK_SIGNATURES.items():
+            if name == signature or name.startswith((signature + ".", signature + "/")):
+                return framework
+        return None
+
+    def _add_dependency(self, dependency, score):
+        framework = self._match_framework(dependency)
+        if framework:
+            self.scores[framework] += score
+
+    def _get_manifest_folders(self):
+        # Manifests are looked up at the root and one level below it so that
+        # simple monorepos are covered as well.
+        folders = [self.root_path]
+        try:
+            with os.scandir(self.root_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                        folders.append(entry.path)
+        except OSError as e:
+            self.logger.error(f"Error while listing {self.root_path}: {e}")
+        return folders
+
+    def _read_requirements(self, path):
+        with open(path, "r", encoding="utf-8", errors="ignore") as file:
+            for line in file:
+                if line.strip().startswith(("#", "-")):
+                    continue
+                match = REQUIREMENT_NAME_PATTERN.match(line)
+                if match:
+                    self._add_dependency(match.group(1), FRAMEWORK_MANIFEST_SCORE)
+
+    def _read_pyproject(self, path):
+        if tomllib is None:
+            return self._read_requirements(path)
+        with open(path, "rb") as file:
+            data = tomllib.load(file)
+        project = data.get("project", {})
+        dependencies = list(project.get("dependencies", []))
+        for optional in project.get("optional-dependencies", {}).values():
+            dependencies.extend(optional)
+        dependencies.extend(
+            data.get("tool", {}).get("poetry", {}).get("dependencies", {}).keys()
+        )
+        for dependency in dependencies:
+            match = REQUIREMENT_NAME_PATTERN.match(dependency)
+            if match:
+                self._add_dependency(match.group(1), FRAMEWORK_MANIFEST_SCORE)
+
+    def _read_setup_cfg(self, path):
+        parser = configparser.ConfigParser()
+        parser.read(path, encoding="utf-8")
+        requirements = parser.get("options", "install_requires", fallback="")
+        for line in requirements.splitlines():
+            match = REQUIREMENT_NAME_PATTERN.match(line)
+            if match:
+                self._add_dependency(match.group(1), FRAMEWORK_MANIFEST_SCORE)
+
+    def _read_package_json(self, path):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        for key in ("dependencies", "devDependencies", "peerDependencies"):
+            for dependency in data.get(key, {}):
+                self._add_dependency(dependency, FRAMEWORK_MANIFEST_SCORE)
+
+    def _read_pom(self, path):
+        tree = ET.parse(path)
+        for element in tree.iter():
+            if element.tag.endswith("groupId") and element.text:
+                self._add_dependency(element.text, FRAMEWORK_MANIFEST_SCORE)
+
+    def read_manifests(self):
+        readers = {
+            "requirements.txt": self._read_requirements,
+            "pyproject.toml": self._read_pyproject,
+            "setup.cfg": self._read_setup_cfg,
+            "package.json": self._read_package_json,
+            "pom.xml": self._read_pom,
+        }
+        for folder in self._get_manifest_folders():
+            for manifest, reader in readers.items():
+                path = os.path.join(folder, manifest)
+                if not os.path.isfile(path):
+                    continue
+                try:
+                    reader(path)
+                except Exception as e:
+                    self.logger.error(f"Error while reading manifest {path}: {e}")
+
+    def read_imports(self):
+        for file_path in self.code_files[:FRAMEWORK_IMPORT_SCAN_LIMIT]:
+            if file_path.endswith(".py"):
+                pattern = PYTHON_IMPORT_PATTERN
+            elif file_path.endswith(".java"):
+                pattern = JAVA_IMPORT_PATTERN
+            elif file_path.endswith((".js", ".jsx", ".ts", ".tsx")):
+                pattern = JS_IMPORT_PATTERN
+            else:
+                continue
+            try:
+                with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+                    content = file.read()
+            except OSError:
+                continue
+            # Every file counts once per framework however often it imports it.
+            frameworks = set(map(self._match_framework, pattern.findall(content)))
+            frameworks.discard(None)
+            for framework in frameworks:
+                self.scores[framework] += FRAMEWORK_IMPORT_SCORE
+
+    def get_primary_language(self):
+        languages = Counter(
+            EXTENSION_LANGUAGES[os.path.splitext(file_path)[1]]
+            for file_path in self.code_files
+            if os.path.splitext(file_path)[1] in EXTENSION_LANGUAGES
+        )
+        if not languages:
+            return None
+        return languages.most_common(1)[0][0]
+
+    def detect(self):
+        """Returns the detected frameworks in the LLM output format and
+        whether the result is too ambiguous to be trusted."""
+        self.read_manifests()
+        self.read_imports()
+
+        ranked = [item for item in self.scores.most_common() if item[1] > 0]
+        if ranked:
+            selected = ranked[:MAX_DETECTED_FRAMEWORKS]
+            # A tie right at the cut-off means we can't tell which frameworks
+            # are the primary ones.
+            is_ambiguous = (
+                len(ranked) > MAX_DETECTED_FRAMEWORKS
+                and ranked[MAX_DETECTED_FRAMEWORKS][1] == selected[-1][1]
+            )
+            names = [framework for framework, _ in selected]
+        else:
+            language = self.get_primary_language()
+            is_ambiguous = language is None
+            names = [language] if language else []
+
+        frameworks = f"[{', '.join(names)}]"
+        self.logger.info(
+            f"Detected frameworks locally: {frameworks}, ambiguous: {is_ambiguous}"
+        )
+        return frameworks, is_ambiguous
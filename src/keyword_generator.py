@@ -1,66 +1,158 @@
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
+import re
+import json
 
 from knowledge_db import DB
+from llm_scheduler import LLMScheduler, estimate_tokens
+from llm_registry import get_prompt_chain
+from offline_keyword_extractor import OfflineKeywordExtractor
 from utils.logger_manager import CustomLogger
-from utils.constants import AI71_BASE_URL, IGNORE_CHARS, LOG_FILE_PATH,KEYWORD_PROMPT
+from utils.utilities import (
+    extract_keywords_list,
+)
+from utils.constants import (
+    IGNORE_CHARS,
+    LOG_FILE_PATH,
+    KEYWORD_BATCH_PROMPT,
+    KEYWORD_BATCH_SIZE,
+    KEYWORD_GENERATION_MODE,
+    LLM_PRIORITY_SETUP,
+    LLM_MAX_RETRIES,
+)
+
+INNER_LIST_PATTERN = re.compile(r"\[([^\[\]]*)\]")
 
 
 class KwGenerator:
 
-    def __init__(self, best_practices_dict, framework):
+    def __init__(
+        self,
+        best_practices_dict,
+        framework,
+        code_files=None,
+        snapshot_store=None,
+        keyword_mode=KEYWORD_GENERATION_MODE,
+    ):
         self.practices_dict_list = best_practices_dict
         self.framework = framework
+        self.code_files = code_files
+        self.snapshot_store = snapshot_store
+        self.keyword_mode = keyword_mode
+        self.db = DB()
         self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
 
     def clean_keyword(self, keyword):
         strip_chars = "".join(IGNORE_CHARS)
         return keyword.strip(strip_chars)
 
-    def generate_keywords(self, practice):
+    def parse_keyword_lists(self, res):
+        keyword_lists_text = extract_keywords_list(res)
         try:
-            llm = ChatOpenAI(
-                model="tiiuae/falcon-180B-chat",
-                base_url=AI71_BASE_URL,
-            )
-            prompt_template = PromptTemplate(
-                template=KEYWORD_PROMPT,
-                input_variables=["framework", "best_practices"],
-            )
+            keyword_lists = json.loads(keyword_lists_text)
+        except json.JSONDecodeError:
+            # Unquoted or single quoted keywords, every inner list is split on commas
+            keyword_lists = [
+                inner_list.split(",")
+                for inner_list in INNER_LIST_PATTERN.findall(keyword_lists_text[1:-1])
+            ]
+        return keyword_lists
 
-            chain = prompt_template | llm
+    def generate_keywords_batch(self, practices):
+        chain = get_prompt_chain(KEYWORD_BATCH_PROMPT, ["framework", "best_practices"])
 
-            res = chain.invoke(
-                {
-                    "framework": self.framework,
-                    "best_practices": practice,
-                }
-            ).content
+        numbered_practices = "".join(
+            f"Best practice {count}. {practice}\n"
+            for count, practice in enumerate(practices, start=1)
+        )
+        res = chain.invoke(
+            {
+                "framework": self.framework,
+                "best_practices": numbered_practices,
+            }
+        ).content
 
-            keywords = res[1:-1].split(",")
-            cleaned_keywords = [self.clean_keyword(k) for k in keywords]
-            return cleaned_keywords
-        except Exception as e:
-            self.logger.error(f"Failed to generate keywords: {e}")
-            return []
+        keyword_lists = self.parse_keyword_lists(res)
+        if len(keyword_lists) != len(practices) or not all(
+            isinstance(keywords, list) for keywords in keyword_lists
+        ):
+            raise ValueError(
+                "The number of keyword lists does not match the number of best practices."
+            )
+        cleaned_keyword_lists = []
+        for keywords in keyword_lists:
+            cleaned_keywords = [self.clean_keyword(str(k)) for k in keywords]
+            cleaned_keyword_lists.append([k for k in cleaned_keywords if k])
+        return cleaned_keyword_lists
 
     def get_practices_with_keywords(self):
+        practices = []
+        for practice_dict in self.practices_dict_list:
+            for _, details in practice_dict.items():
+                if details["statement"] not in practices:
+                    practices.append(details["statement"])
+
+        practice_keywords = self.get_keywords_for_practices(practices)
         for practice_dict in self.practices_dict_list:
             for _, details in practice_dict.items():
-                practice = details["statement"]
-                keywords = self.get_keywords(practice)
-                details["keywords"] = keywords
+                details["keywords"] = practice_keywords.get(details["statement"], [])
         return self.practices_dict_list
 
-    def get_keywords(self, best_practice: str):
-        # fetch_or_generate_keywords
+    def get_offline_keywords(self, practices):
+        return OfflineKeywordExtractor(
+            practices, self.code_files, self.snapshot_store
+        ).extract_all()
 
-        db = DB()
-        keywords = db.get_keywords(best_practice)
-        self.logger.info(f"Fetched keywords for best practice : {best_practice}")
+    def get_keywords_for_practices(self, practices):
+        if self.keyword_mode == "offline":
+            self.logger.info("Generating keywords offline")
+            return self.get_offline_keywords(practices)
 
-        if not keywords:
-            keywords = self.generate_keywords(best_practice)
-            db.add_practice(best_practice, keywords)
-            self.logger.info(f"Stored keywords for best practice : {best_practice}")
-        return keywords
+        # One query for every cached practice, the misses are batched into
+        # multi practice prompts which run concurrently.
+        practice_keywords = self.db.get_keywords_bulk(practices)
+        self.logger.info(
+            f"Fetched keywords for {len(practice_keywords)} of {len(practices)} best practices"
+        )
+
+        missing_practices = [p for p in practices if not practice_keywords.get(p)]
+        batches = [
+            missing_practices[i : i + KEYWORD_BATCH_SIZE]
+            for i in range(0, len(missing_practices), KEYWORD_BATCH_SIZE)
+        ]
+        results = LLMScheduler().map_ordered(
+            self.generate_keywords_batch,
+            batches,
+            priority=LLM_PRIORITY_SETUP,
+            token_estimator=lambda batch: estimate_tokens(KEYWORD_BATCH_PROMPT, *batch),
+            retries=LLM_MAX_RETRIES,
+        )
+
+        new_practice_keywords = {}
+        failed_practices = []
+        for batch, (keyword_lists, error) in zip(batches, results):
+            if error:
+                self.logger.error(
+                    f"Failed to generate keywords for {len(batch)} best practices: {error}"
+                )
+                failed_practices.extend(batch)
+                continue
+            for practice, keywords in zip(batch, keyword_lists):
+                if keywords:
+                    new_practice_keywords[practice] = keywords
+                else:
+                    failed_practices.append(practice)
+
+        if new_practice_keywords:
+            self.db.add_practices_bulk(new_practice_keywords)
+            self.logger.info(
+                f"Stored keywords for {len(new_practice_keywords)} best practices"
+            )
+        practice_keywords.update(new_practice_keywords)
+
+        # Offline keywords are a fallback only, they are not cached so the
+        # LLM gets another chance on the next run.
+        if failed_practices:
+            self.logger.info(
+                f"Using offline keywords for {len(failed_practices)} best practices"
+            )
+            practice_keywords.update(self.get_offline_keywords(failed_practices))
+        return practice_keywords
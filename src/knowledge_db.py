@@ -4,6 +4,12 @@ from utils.constants import (
     LOG_FILE_PATH,
     SQLITE_KEYWORD_TABLE_NAME,
     SQLITE_FILE_TABLE_NAME,
+    SQLITE_FRAMEWORK_TABLE_NAME,
+    SQLITE_STRUCTURE_TABLE_NAME,
+    SQLITE_CONFLUENCE_TABLE_NAME,
+    SQLITE_PRACTICE_TABLE_NAME,
+    SQLITE_TOKEN_TABLE_NAME,
+    SQLITE_CHUNK_TABLE_NAME,
     SQLITE_DB_NAME,
 )
 
@@ -15,9 +21,23 @@ class DB:
         sqlite_db_name=SQLITE_DB_NAME,
         sqlite_keyword_table_name=SQLITE_KEYWORD_TABLE_NAME,
         sqlite_file_table_name=SQLITE_FILE_TABLE_NAME,
+        sqlite_framework_table_name=SQLITE_FRAMEWORK_TABLE_NAME,
+        sqlite_structure_table_name=SQLITE_STRUCTURE_TABLE_NAME,
+        sqlite_confluence_table_name=SQLITE_CONFLUENCE_TABLE_NAME,
+        sqlite_practice_table_name=SQLITE_PRACTICE_TABLE_NAME,
+        sqlite_token_table_name=SQLITE_TOKEN_TABLE_NAME,
+        sqlite_chunk_table_name=SQLITE_CHUNK_TABLE_NAME,
     ):
         self.sqlite = SQLite(
-            sqlite_db_name, sqlite_keyword_table_name, sqlite_file_table_name
+            sqlite_db_name,
+            sqlite_keyword_table_name,
+            sqlite_file_table_name,
+            sqlite_framework_table_name,
+            sqlite_structure_table_name,
+            sqlite_confluence_table_name,
+            sqlite_practice_table_name,
+            sqlite_token_table_name,
+            sqlite_chunk_table_name,
         )
         self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
 
@@ -32,6 +52,17 @@ class DB:
                 f"Error while inserting best practice '{best_practice}' into knowledge store: {str(e)}"
             )
 
+    def add_practices_bulk(self, practice_keywords):
+        try:
+            self.sqlite.insert_best_practices_bulk(practice_keywords)
+            self.logger.info(
+                f"Inserted {len(practice_keywords)} best practices into knowledge store"
+            )
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting best practices into knowledge store: {str(e)}"
+            )
+
     def insert_file(self, file_code, best_practice, response):
         try:
             self.logger.info(
@@ -43,6 +74,26 @@ class DB:
                 f"Error while inserting file response with best practice '{best_practice}' into knowledge store: {str(e)}"
             )
 
+    def add_file_responses(self, file_responses):
+        try:
+            self.sqlite.insert_files_by_hash_bulk(file_responses)
+            self.logger.info(
+                f"Inserted {len(file_responses)} file responses into knowledge store"
+            )
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting file responses into knowledge store: {str(e)}"
+            )
+
+    def query_files_by_hash(self, file_practice_hashes):
+        try:
+            return self.sqlite.query_files_by_hash_bulk(file_practice_hashes)
+        except Exception as e:
+            self.logger.error(
+                f"Error while querying file responses in knowledge store: {str(e)}"
+            )
+            return {}
+
     def query_file(self, file_code, best_practice):
         try:
             self.logger.info(
@@ -66,3 +117,122 @@ class DB:
             self.logger.error(
                 f"Error while querying keywords of best practice '{best_practice}' in knowledge store: {str(e)}"
             )
+
+    def get_keywords_bulk(self, best_practices):
+        try:
+            return self.sqlite.get_keywords_bulk(best_practices)
+        except Exception as e:
+            self.logger.error(
+                f"Error while querying keywords of best practices in knowledge store: {str(e)}"
+            )
+            return {}
+
+    def add_framework(self, project_structure, frameworks):
+        try:
+            self.sqlite.insert_framework(project_structure, frameworks)
+            self.logger.info(f"Inserted frameworks '{frameworks}' into knowledge store")
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting frameworks '{frameworks}' into knowledge store: {str(e)}"
+            )
+
+    def get_framework(self, project_structure):
+        try:
+            return self.sqlite.query_framework(project_structure)
+        except Exception as e:
+            self.logger.error(
+                f"Error while querying frameworks of project structure in knowledge store: {str(e)}"
+            )
+
+    def add_structure_summary(self, source, token_budget, summary):
+        try:
+            self.sqlite.insert_structure_summary(source, token_budget, summary)
+            self.logger.info("Inserted project structure summary into knowledge store")
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting project structure summary into knowledge store: {str(e)}"
+            )
+
+    def get_structure_summary(self, source, token_budget):
+        try:
+            return self.sqlite.query_structure_summary(source, token_budget)
+        except Exception as e:
+            self.logger.error(
+                f"Error while querying project structure summary in knowledge store: {str(e)}"
+            )
+
+    def add_confluence_page(self, base_url, page_id, version, content):
+        try:
+            self.sqlite.insert_confluence_page(base_url, page_id, version, content)
+            self.logger.info(
+                f"Inserted confluence page '{page_id}' version {version} into knowledge store"
+            )
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting confluence page '{page_id}' into knowledge store: {str(e)}"
+            )
+
+    def get_confluence_page(self, base_url, page_id):
+        try:
+            return self.sqlite.query_confluence_page(base_url, page_id)
+        except Exception as e:
+            self.logger.error(
+                f"Error while querying confluence page '{page_id}' in knowledge store: {str(e)}"
+            )
+
+    def add_processed_practices(self, raw_practice_data, frameworks, practices):
+        try:
+            self.sqlite.insert_processed_practices(raw_practice_data, frameworks, practices)
+            self.logger.info("Inserted processed practices into knowledge store")
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting processed practices into knowledge store: {str(e)}"
+            )
+
+    def get_processed_practices(self, raw_practice_data, frameworks):
+        try:
+            return self.sqlite.query_processed_practices(raw_practice_data, frameworks)
+        except Exception as e:
+            self.logger.error(
+                f"Error while querying processed practices in knowledge store: {str(e)}"
+            )
+
+    def add_token_signatures(self, token_signatures):
+        try:
+            self.sqlite.insert_token_signatures_bulk(token_signatures)
+            self.logger.info(
+                f"Inserted {len(token_signatures)} token signatures into knowledge store"
+            )
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting token signatures into knowledge store: {str(e)}"
+            )
+
+    def get_token_signatures(self, file_hashes):
+        try:
+            return self.sqlite.get_token_signatures_bulk(file_hashes)
+        except Exception as e:
+            self.logger.error(
+                f"Error while querying token signatures in knowledge store: {str(e)}"
+            )
+            return {}
+
+    def add_chunk_responses(self, chunk_responses):
+        try:
+            self.sqlite.insert_chunk_responses_bulk(chunk_responses)
+            self.logger.info(
+                f"Inserted {len(chunk_responses)} chunk responses into knowledge store"
+            )
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting chunk responses into knowledge store: {str(e)}"
+            )
+
+    def get_chunk_responses(self, cache_keys):
+        try:
+            return self.sqlite.get_chunk_responses_bulk(cache_keys)
+        except Exception as e:
+            self.logger.error(
+                f"Error while querying chunk responses in knowledge store: {str(e)}"
+            )
+            return {}
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import weakref
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain.prompts import PromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
+from langchain.chains.combine_documents import create_stuff_documents_chain
+
+from utils.constants import (
+    MODEL_NAME,
+    AI71_BASE_URL,
+    SYSTEM_PROMPT,
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_HTTP_KEEPALIVE_EXPIRY,
+    LLM_HTTP_TIMEOUT,
+)
+
+# Long lived clients and chains shared by every call site of the process.
+# Building them per call costs a new connection pool and TLS handshake.
+_registry_lock = threading.RLock()
+_http_client = None
+# {event loop: {"http_client": AsyncClient, "prompt_chains": {key: chain}}}, an
+# async connection pool belongs to the loop it was first used on.
+_loop_clients = weakref.WeakKeyDictionary()
+_chat_models = {}
+_embeddings = {}
+_prompt_chains = {}
+_documents_chains = {}
+
+
+def _get_or_create(cache, key, factory):
+    instance = cache.get(key)
+    if instance is None:
+        with _registry_lock:
+            instance = cache.get(key)
+            if instance is None:
+                instance = cache[key] = factory()
+    return instance
+
+
+def _get_http_limits():
+    return httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client():
+    """Keep-alive connection pool shared by every LLM and embedding client"""
+    global _http_client
+    with _registry_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=_get_http_limits(), timeout=LLM_HTTP_TIMEOUT
+            )
+        return _http_client
+
+
+def _get_loop_clients():
+    """Async connection pool and chains of the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        loop_clients = _loop_clients.get(loop)
+        if loop_clients is None:
+            loop_clients = _loop_clients[loop] = {
+                "http_client": httpx.AsyncClient(
+                    limits=_get_http_limits(), timeout=LLM_HTTP_TIMEOUT
+                ),
+                "prompt_chains": {},
+            }
+        return loop_clients
+
+
+async def aclose_async_http_client():
+    """Closes the connection pool of the running event loop and drops the
+    chains which use it, called before the loop is closed."""
+    with _registry_lock:
+        loop_clients = _loop_clients.pop(asyncio.get_running_loop(), None)
+    if loop_clients is not None:
+        await loop_clients["http_client"].aclose()
+
+
+def get_chat_model(model_name=MODEL_NAME, **model_kwargs):
+    """Returns the shared chat model of the model name and configuration
+
+    params:
+        - model_name : Name of the model
+        - model_kwargs : Other ChatOpenAI arguments like temperature or streaming
+    """
+    key = (model_name, tuple(sorted(model_kwargs.items())))
+    return _get_or_create(
+        _chat_models,
+        key,
+        lambda: ChatOpenAI(
+            model_name=model_name,
+            base_url=AI71_BASE_URL,
+            http_client=get_http_client(),
+            **model_kwargs,
+        ),
+    )
+
+
+def get_embeddings(model_name, dimensions):
+    return _get_or_create(
+        _embeddings,
+        (model_name, dimensions),
+        lambda: OpenAIEmbeddings(
+            model=model_name,
+            dimensions=dimensions,
+            http_client=get_http_client(),
+        ),
+    )
+
+
+def get_prompt_chain(template, input_variables, model_name=MODEL_NAME, **model_kwargs):
+    """Returns the shared prompt template and chat model chain of the template"""
+    key = (template, tuple(input_variables), model_name, tuple(sorted(model_kwargs.items())))
+    return _get_or_create(
+        _prompt_chains,
+        key,
+        lambda: PromptTemplate(template=template, input_variables=list(input_variables))
+        | get_chat_model(model_name, **model_kwargs),
+    )
+
+
+def get_async_prompt_chain(template, input_variables, model_name=MODEL_NAME, **model_kwargs):
+    """Returns the prompt template and chat model chain of the template for
+    ainvoke calls on the running event loop. Must be called from a coroutine."""
+    loop_clients = _get_loop_clients()
+    key = (template, tuple(input_variables), model_name, tuple(sorted(model_kwargs.items())))
+    return _get_or_create(
+        loop_clients["prompt_chains"],
+        key,
+        lambda: PromptTemplate(template=template, input_variables=list(input_variables))
+        | ChatOpenAI(
+            model_name=model_name,
+            base_url=AI71_BASE_URL,
+            http_client=get_http_client(),
+            http_async_client=loop_clients["http_client"],
+            **model_kwargs,
+        ),
+    )
+
+
+def get_documents_chain(model_name=MODEL_NAME, **model_kwargs):
+    """Returns the shared chain which answers a question from retrieved documents"""
+    key = (model_name, tuple(sorted(model_kwargs.items())))
+
+    def create_documents_chain():
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", SYSTEM_PROMPT),
+                ("human", "{input}"),
+            ]
+        )
+        return create_stuff_documents_chain(get_chat_model(model_name, **model_kwargs), prompt)
+
+    return _get_or_create(_documents_chains, key, create_documents_chain)
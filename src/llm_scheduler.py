@@ -0,0 +1,177 @@
+import time
+import asyncio
+import heapq
+import itertools
+import threading
+import contextvars
+from concurrent.futures import Future
+
+from utils.logger_manager import CustomLogger, singleton
+from utils.utilities import count_tokens, get_retry_delay
+from utils.constants import (
+    LOG_FILE_PATH,
+    LLM_MAX_CONCURRENT_REQUESTS,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_RESPONSE_TOKEN_ESTIMATE,
+    LLM_PRIORITY_ANALYSIS,
+    LLM_SCHEDULER_THREAD_PREFIX,
+)
+
+
+def estimate_tokens(*texts):
+    """Estimated tokens of a request, its prompt inputs plus the expected response"""
+    return sum(count_tokens(str(text)) for text in texts) + LLM_RESPONSE_TOKEN_ESTIMATE
+
+
+class TokenBucket:
+    """Tokens per minute budget which refills continuously."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.tokens = tokens_per_minute
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self, tokens):
+        """Takes the tokens and returns 0, or returns the seconds to wait for them"""
+        # A request above the whole budget waits for a full bucket
+        tokens = min(tokens, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated_at) * self.capacity / 60,
+            )
+            self.updated_at = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0
+            return (tokens - self.tokens) * 60 / self.capacity
+
+    def acquire(self, tokens):
+        if not self.capacity:
+            return
+        wait = self._take(tokens)
+        while wait:
+            time.sleep(wait)
+            wait = self._take(tokens)
+
+    async def acquire_async(self, tokens):
+        if not self.capacity:
+            return
+        wait = self._take(tokens)
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self._take(tokens)
+
+
+@singleton
+class LLMScheduler:
+    """Process wide priority queue for every LLM call.
+
+    A fixed set of worker threads caps the in-flight requests and every
+    request takes its estimated tokens from a tokens per minute budget.
+    Lower priority values run first, requests of the same priority run in
+    submission order. Only leaf LLM calls may be submitted, a task which
+    waits on another scheduled task can deadlock the queue.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=LLM_MAX_CONCURRENT_REQUESTS,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    ):
+        self.queue = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
+        self.workers = [
+            threading.Thread(
+                target=self._work,
+                name=f"{LLM_SCHEDULER_THREAD_PREFIX}_{i}",
+                daemon=True,
+            )
+            for i in range(max_concurrency)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(
+        self, func, *args, priority=LLM_PRIORITY_ANALYSIS, tokens=0, retries=0, **kwargs
+    ):
+        """Queues the call and returns its future. The call runs in a copy of
+        the caller's context like ContextThreadPoolExecutor does.
+
+        A failed call is queued again up to retries times after a backoff
+        delay, so every attempt waits for a worker and takes its tokens
+        instead of sleeping on a worker.
+        """
+        future = Future()
+        context = contextvars.copy_context()
+        self._push((priority, future, tokens, context, func, args, kwargs, retries, 0))
+        return future
+
+    def _push(self, task):
+        with self.condition:
+            heapq.heappush(self.queue, (task[0], next(self.counter), task))
+            self.condition.notify()
+
+    def _retry(self, task, error):
+        priority, future, tokens, context, func, args, kwargs, retries, attempt = task
+        delay = get_retry_delay(attempt)
+        self.logger.info(
+            f"Attempt {attempt + 1} of {getattr(func, '__name__', func)} failed: {error}, retrying in {delay:.1f}s"
+        )
+        timer = threading.Timer(
+            delay,
+            self._push,
+            args=((priority, future, tokens, context, func, args, kwargs, retries, attempt + 1),),
+        )
+        timer.daemon = True
+        timer.start()
+
+    def map_ordered(
+        self, func, items, priority=LLM_PRIORITY_ANALYSIS, token_estimator=None, retries=0
+    ):
+        """Runs the function on every item through the queue
+
+        return:
+            - list : (result, exception) for every item, in the order of the items
+        """
+        futures = [
+            self.submit(
+                func,
+                item,
+                priority=priority,
+                tokens=token_estimator(item) if token_estimator else 0,
+                retries=retries,
+            )
+            for item in items
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append((future.result(), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                _, _, task = heapq.heappop(self.queue)
+            _, future, tokens, context, func, args, kwargs, retries, attempt = task
+            # A retried future is already running
+            if attempt == 0 and not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self.token_bucket.acquire(tokens)
+                future.set_result(context.run(func, *args, **kwargs))
+            except Exception as e:
+                if attempt < retries:
+                    self._retry(task, e)
+                else:
+                    future.set_exception(e)
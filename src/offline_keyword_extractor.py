@@ -0,0 +1,102 @@
+import re
+import math
+from collections import Counter
+
+from utils.logger_manager import CustomLogger
+from utils.constants import (
+    LOG_FILE_PATH,
+    OFFLINE_KEYWORD_LIMIT,
+    OFFLINE_KEYWORD_STOPWORDS,
+    OFFLINE_KEYWORD_REPO_BOOST,
+    OFFLINE_KEYWORD_CODE_BOOST,
+    OFFLINE_KEYWORD_PHRASE_WEIGHT,
+)
+
+CODE_SPAN_PATTERN = re.compile(r"`([^`]+)`")
+WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_.]*(?:\(\))?")
+IDENTIFIER_PATTERN = re.compile(r"\b[A-Za-z_][A-Za-z0-9_]{2,}\b")
+
+
+class OfflineKeywordExtractor:
+    """Generates keywords for best practices with TF-IDF over the practice
+    statements, boosted by the identifiers used in the target repository."""
+
+    def __init__(self, practices, code_files=None, snapshot_store=None):
+        self.practices = practices
+        self.code_files = code_files or []
+        self.snapshot_store = snapshot_store
+        self.stopwords = set(OFFLINE_KEYWORD_STOPWORDS)
+        self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
+        self.repo_vocabulary = self._build_repo_vocabulary()
+        self.document_frequency = Counter()
+        for practice in practices:
+            self.document_frequency.update(set(self._get_candidates(practice)))
+
+    def _read(self, file_path):
+        if self.snapshot_store is not None:
+            return self.snapshot_store.get_content(file_path)
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+            return file.read()
+
+    def _build_repo_vocabulary(self):
+        vocabulary = set()
+        for file_path in self.code_files:
+            try:
+                vocabulary.update(
+                    identifier.lower()
+                    for identifier in IDENTIFIER_PATTERN.findall(self._read(file_path))
+                )
+            except Exception as e:
+                self.logger.error(f"Error while reading {file_path} for keywords: {e}")
+        return vocabulary
+
+    def _is_code_like(self, token):
+        return (
+            "_" in token
+            or "." in token
+            or token.endswith("()")
+            or (any(ch.isupper() for ch in token[1:]) and not token.isupper())
+        )
+
+    def _get_candidates(self, practice):
+        candidates = [span.strip() for span in CODE_SPAN_PATTERN.findall(practice)]
+        words = [
+            word.strip(".")
+            for word in WORD_PATTERN.findall(CODE_SPAN_PATTERN.sub(" ", practice))
+        ]
+        words = [word for word in words if len(word) > 2]
+        for i, word in enumerate(words):
+            if word.lower() in self.stopwords:
+                continue
+            candidates.append(word)
+            # Two word phrases catch terms like "status code" or "context manager"
+            if i + 1 < len(words) and words[i + 1].lower() not in self.stopwords:
+                candidates.append(f"{word} {words[i + 1]}")
+        return [candidate for candidate in candidates if candidate]
+
+    def _score(self, candidate, term_frequency, is_code_span):
+        idf = math.log((1 + len(self.practices)) / (1 + self.document_frequency[candidate])) + 1
+        score = term_frequency * idf
+        if " " in candidate:
+            score *= OFFLINE_KEYWORD_PHRASE_WEIGHT
+        if is_code_span or (" " not in candidate and self._is_code_like(candidate)):
+            score *= OFFLINE_KEYWORD_CODE_BOOST
+        base_name = candidate.lower().rstrip("()").split(".")[-1]
+        if base_name in self.repo_vocabulary:
+            score *= OFFLINE_KEYWORD_REPO_BOOST
+        return score
+
+    def extract(self, practice):
+        code_spans = {span.strip() for span in CODE_SPAN_PATTERN.findall(practice)}
+        term_frequency = Counter(self._get_candidates(practice))
+        ranked = sorted(
+            term_frequency,
+            key=lambda candidate: self._score(
+                candidate, term_frequency[candidate], candidate in code_spans
+            ),
+            reverse=True,
+        )
+        return ranked[:OFFLINE_KEYWORD_LIMIT]
+
+    def extract_all(self):
+        return {practice: self.extract(practice) for practice in self.practices}
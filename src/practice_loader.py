@@ -1,20 +1,30 @@
 import os
 import re
+import threading
+import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from atlassian import Confluence
 from langchain_core.runnables.config import ContextThreadPoolExecutor
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 
+from knowledge_db import DB
+from llm_scheduler import LLMScheduler, estimate_tokens
+from llm_registry import get_prompt_chain
 from utils.logger_manager import CustomLogger
 from utils.constants import (
-    AI71_BASE_URL,
     LOG_FILE_PATH,
     BEST_PRACTICE_PATTERN,
     STATEMENT_PATTERN,
     REFERENCE_PATTERN,
     KEYWORD_CHUNK_SIZE,
-    MAX_WORKERS_FOR_KEYWORD_CHUNKING,
+    BIFURCATION_CHUNK_TOKEN_LIMIT,
+    BIFURCATION_PARTIAL_RESULT_POLICY,
+    MAX_PRACTICE_SOURCES_CONCURRENTLY,
+    CONFLUENCE_CONNECTION_POOL_SIZE,
+    CONFLUENCE_CHILD_PAGE_LIMIT,
+    CONFLUENCE_PAGE_URL_FORMAT,
+    LLM_PRIORITY_SETUP,
+    LLM_MAX_RETRIES,
     BIFURCATION_PROMPT
 )
 from utils.exceptions import (
@@ -22,13 +32,34 @@ from utils.exceptions import (
     NoPracticeFoundError,
     BestPracticeProcessorError,
 )
-from utils.utilities import _extract_base_url, extract_list
+from utils.utilities import (
+    _extract_base_url,
+    extract_list,
+    count_tokens,
+)
 
 
 class PracticeLoader:
-    def __init__(self, practice_link, frameworks=None, username=None, password=None):
+    def __init__(
+        self,
+        practice_link,
+        frameworks=None,
+        username=None,
+        password=None,
+        parent_page_id=None,
+        confluence_url=None,
+        partial_result_policy=BIFURCATION_PARTIAL_RESULT_POLICY,
+    ):
         self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
-        self.practice_link = practice_link
+        # A single link, a list of links and/or a confluence page tree can be given
+        if isinstance(practice_link, str):
+            self.practice_links = [practice_link]
+        else:
+            self.practice_links = list(practice_link or [])
+        self.practice_link = self.practice_links[0] if self.practice_links else None
+        self.parent_page_id = parent_page_id
+        self.confluence_url = confluence_url
+        self.partial_result_policy = partial_result_policy
         self.frameworks = (
             f"Programming languages and Frameworks: {frameworks}\n"
             if frameworks
@@ -36,20 +67,104 @@ class PracticeLoader:
         )
         self.auth_user = username 
         self.auth_pass = password
-
-    def fetch_practices(self):
-        if os.path.isfile(self.practice_link):
-            raw_practice_data = self.read_file()
+        self.db = DB()
+        self.session = self._create_session()
+        self.confluence_clients = {}
+        self.client_lock = threading.Lock()
+
+    def _create_session(self):
+        # One keep-alive pool shared by every confluence request of this loader
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=CONFLUENCE_CONNECTION_POOL_SIZE,
+            pool_maxsize=CONFLUENCE_CONNECTION_POOL_SIZE,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get_confluence_client(self, base_url):
+        with self.client_lock:
+            if base_url not in self.confluence_clients:
+                self.confluence_clients[base_url] = Confluence(
+                    url=base_url,
+                    username=self.auth_user,
+                    password=self.auth_pass,
+                    verify_ssl=False,
+                    session=self.session,
+                )
+            return self.confluence_clients[base_url]
+
+    def get_page_tree_links(self):
+        if not self.confluence_url and not self.practice_link:
+            raise InvalidLinkError("Confluence url is required to read a page tree.")
+        base_url = self.confluence_url or _extract_base_url(self.practice_link)
+        client = self.get_confluence_client(base_url)
+
+        page_ids = []
+        current_level = [str(self.parent_page_id)]
+        with ContextThreadPoolExecutor(
+            max_workers=MAX_PRACTICE_SOURCES_CONCURRENTLY
+        ) as executor:
+            while current_level:
+                next_level = []
+                for child_ids in executor.map(
+                    lambda page_id: self._get_child_page_ids(client, page_id),
+                    current_level,
+                ):
+                    next_level.extend(child_ids)
+                page_ids.extend(next_level)
+                current_level = next_level
+
+        self.logger.info(
+            f"Found {len(page_ids)} pages under confluence page {self.parent_page_id}"
+        )
+        return [
+            CONFLUENCE_PAGE_URL_FORMAT.format(base_url=base_url, page_id=page_id)
+            for page_id in page_ids
+        ]
+
+    def _get_child_page_ids(self, client, page_id):
+        child_ids = []
+        start = 0
+        while True:
+            children = client.get_page_child_by_type(
+                page_id, type="page", start=start, limit=CONFLUENCE_CHILD_PAGE_LIMIT
+            )
+            child_ids.extend(str(child["id"]) for child in children)
+            if len(children) < CONFLUENCE_CHILD_PAGE_LIMIT:
+                return child_ids
+            start += CONFLUENCE_CHILD_PAGE_LIMIT
+
+    def fetch_practices(self, practice_link=None):
+        practice_link = practice_link or self.practice_link
+        if os.path.isfile(practice_link):
+            raw_practice_data = self.read_file(practice_link)
         else:
-            raw_practice_data = self.read_confluence()
-        self.logger.info(f"Successfully read best practices from: {self.practice_link}")
+            raw_practice_data = self.read_confluence(practice_link)
+        self.logger.info(f"Successfully read best practices from: {practice_link}")
 
         return raw_practice_data
 
-    def _make_chunks(self, practices, chunk_size=KEYWORD_CHUNK_SIZE):
+    def _make_chunks(
+        self, practices, chunk_size=KEYWORD_CHUNK_SIZE, token_limit=BIFURCATION_CHUNK_TOKEN_LIMIT
+    ):
+        # Chunks are closed on whichever comes first, the practice count or the token limit
         chunks = []
-        for i in range(0, len(practices), chunk_size):
-            chunks.append(practices[i : i + chunk_size])
+        chunk = []
+        chunk_tokens = 0
+        for practice in practices:
+            practice_tokens = count_tokens(practice["statement"])
+            if chunk and (
+                len(chunk) >= chunk_size or chunk_tokens + practice_tokens > token_limit
+            ):
+                chunks.append(chunk)
+                chunk = []
+                chunk_tokens = 0
+            chunk.append(practice)
+            chunk_tokens += practice_tokens
+        if chunk:
+            chunks.append(chunk)
 
         return chunks
 
@@ -61,7 +176,7 @@ class PracticeLoader:
             count += 1
         return ans
 
-    def process_chunk(self, chunk, all_keyword_practice_map):
+    def process_chunk(self, chunk):
         best_practices = self._make_numbered_chunks(chunk)
 
         processed_practices = self.process_best_practice(best_practices)
@@ -69,9 +184,7 @@ class PracticeLoader:
             raise BestPracticeProcessorError(
                 "The number of processed best practices does not match the number of best practices."
             )
-        keyword_practice_map = self.get_keyword_practice_map(processed_practices, chunk)
-
-        all_keyword_practice_map.append(keyword_practice_map)
+        return self.get_keyword_practice_map(processed_practices, chunk)
 
     def generate_unique_key(self, base_key, keyword_dict):
         while True:
@@ -79,37 +192,98 @@ class PracticeLoader:
             if base_key not in keyword_dict:
                 return base_key
 
-    def process_best_practices(self):
-        try:
-            unprocessed_data = self.fetch_practices()
+    def merge_practices(self, practice_maps):
+        # Sources are merged in input order so colliding keys get stable suffixes
+        res = {}
+        for practice_map in practice_maps:
+            for k in practice_map:
+                if k in res:
+                    new_k = self.generate_unique_key(k, res)
+                    res[new_k] = practice_map[k]
+                else:
+                    res[k] = practice_map[k]
+        return res
+
+    def process_raw_practices(self, unprocessed_data, is_optional=False):
+        cached_practices = self.db.get_processed_practices(
+            unprocessed_data, self.frameworks
+        )
+        if cached_practices:
+            self.logger.info("Found processed best practices in knowledge store")
+            return cached_practices
 
+        try:
             best_practices_dict = self.parse_best_practices(unprocessed_data)
+        except (NoPracticeFoundError, ValueError) as error:
+            # Pages of a page tree are allowed to have no practices in them
+            if is_optional:
+                self.logger.info(f"Skipping page without best practices: {error}")
+                return {}
+            raise
+
+        chunks = self._make_chunks(best_practices_dict)
+        self.logger.info(f"Received {len(chunks)} chunks")
+        results = LLMScheduler().map_ordered(
+            self.process_chunk,
+            chunks,
+            priority=LLM_PRIORITY_SETUP,
+            token_estimator=lambda chunk: estimate_tokens(
+                BIFURCATION_PROMPT, self._make_numbered_chunks(chunk)
+            ),
+            retries=LLM_MAX_RETRIES,
+        )
 
-            executor = ContextThreadPoolExecutor(
-                max_workers=MAX_WORKERS_FOR_KEYWORD_CHUNKING
+        final_mapping = []
+        failed_practices = 0
+        for chunk, (keyword_practice_map, error) in zip(chunks, results):
+            if error:
+                failed_practices += len(chunk)
+                self.logger.error(
+                    f"Failed to process {len(chunk)} best practices after retries: {error}"
+                )
+            else:
+                final_mapping.append(keyword_practice_map)
+
+        if failed_practices and (
+            self.partial_result_policy == "raise" or not final_mapping
+        ):
+            raise BestPracticeProcessorError(
+                f"Processing failed for {failed_practices} of {len(best_practices_dict)} best practices."
             )
 
-            chunks = self._make_chunks(best_practices_dict)
-            final_mapping = []
-            self.logger.info(f"Received {len(chunks)} chunks")
-            for chunk in chunks:
-                executor.submit(
-                    self.process_chunk,
-                    chunk,
-                    final_mapping,
+        res = self.merge_practices(final_mapping)
+        # Only a complete result is worth reusing on the next run
+        if not failed_practices:
+            self.db.add_processed_practices(unprocessed_data, self.frameworks, res)
+        return res
+
+    def process_best_practices(self):
+        try:
+            practice_links = list(self.practice_links)
+            optional_links = set()
+            if self.parent_page_id:
+                # Tree pages keep the breadth first order of the page tree
+                for link in self.get_page_tree_links():
+                    if link not in practice_links:
+                        practice_links.append(link)
+                        optional_links.add(link)
+            if not practice_links:
+                raise InvalidLinkError("No best practice link provided.")
+
+            with ContextThreadPoolExecutor(
+                max_workers=MAX_PRACTICE_SOURCES_CONCURRENTLY
+            ) as executor:
+                unprocessed_data_list = list(
+                    executor.map(self.fetch_practices, practice_links)
                 )
-            executor.shutdown(wait=True)
-            if not final_mapping:
-                return {}
-            res = final_mapping[0]
-            for i in range(1, len(final_mapping)):
-                for k in final_mapping[i]:
-                    if k in res:
-                        new_k = self.generate_unique_key(k, res)
-                        res[new_k] = final_mapping[i][k]
-                    else:
-                        res[k] = final_mapping[i][k]
-            return res
+                practice_maps = list(
+                    executor.map(
+                        self.process_raw_practices,
+                        unprocessed_data_list,
+                        [link in optional_links for link in practice_links],
+                    )
+                )
+            return self.merge_practices(practice_maps)
 
         except (
             InvalidLinkError,
@@ -120,24 +294,33 @@ class PracticeLoader:
             self.logger.error(str(error))
             raise error
 
-    def read_file(self):
+    def read_file(self, practice_link=None):
         content = ""
-        with open(self.practice_link, "r") as file:
+        with open(practice_link or self.practice_link, "r") as file:
             content = file.read()
         return content
 
-    def read_confluence(self):
-        client = Confluence(
-            url=_extract_base_url(self.practice_link),
-            username=self.auth_user,
-            password=self.auth_pass,
-            verify_ssl=False,
-        )
-        match = re.match(r".*pageId=(\d+)", self.practice_link)
+    def read_confluence(self, practice_link=None):
+        practice_link = practice_link or self.practice_link
+        base_url = _extract_base_url(practice_link)
+        client = self.get_confluence_client(base_url)
+        match = re.match(r".*pageId=(\d+)", practice_link)
         if not match:
-            raise ValueError(f"Invalid URL: {self.practice_link}")
+            raise ValueError(f"Invalid URL: {practice_link}")
         page_id = match.group(1)
 
+        # A version only probe is enough to know whether the cached page is current
+        # Page ids are only unique within one confluence site
+        cached_page = self.db.get_confluence_page(base_url, page_id)
+        if cached_page:
+            cached_version, cached_content = cached_page
+            page_version = client.get_page_by_id(page_id, "version")["version"]["number"]
+            if page_version == cached_version:
+                self.logger.info(
+                    f"Confluence page {page_id} version {page_version} found in knowledge store"
+                )
+                return cached_content
+
         raw_content = client.get_page_by_id(
             page_id, "space,body.view,version,container"
         )
@@ -145,21 +328,15 @@ class PracticeLoader:
             raw_content["body"]["view"]["value"], "html.parser"
         )
         text_content = parsed_content.get_text()
+        self.db.add_confluence_page(
+            base_url, page_id, raw_content["version"]["number"], text_content
+        )
 
         return text_content
 
     def process_best_practice(self, raw_practice_data):
         processed_practices = []
-        llm = ChatOpenAI(
-            model="tiiuae/falcon-180B-chat",
-            base_url=AI71_BASE_URL,
-        )
-        prompt_template = PromptTemplate(
-            template=BIFURCATION_PROMPT,
-            input_variables=["framework", "best_practices"],
-        )
-
-        chain = prompt_template | llm
+        chain = get_prompt_chain(BIFURCATION_PROMPT, ["framework", "best_practices"])
 
         res = chain.invoke(
             {
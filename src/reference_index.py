@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+import requests
+from bs4 import BeautifulSoup
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from llm_registry import get_embeddings
+from utils.logger_manager import CustomLogger
+from utils.utilities import create_hash
+from utils.constants import (
+    LOG_FILE_PATH,
+    EMBEDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    DOCUMENTATION_SPLIT_MODEL,
+    DOCUMENTATION_CHUNK_OVERLAP,
+    DOCUMENTATION_CHUNK_TOKEN_LIMIT,
+    REFERENCE_INDEX_FOLDER_PATH,
+    REFERENCE_INDEX_MAX_SIZE_BYTES,
+    REFERENCE_INDEX_MEMORY_TTL,
+    REFERENCE_PAGE_REQUEST_TIMEOUT,
+)
+
+METADATA_FILE_NAME = "metadata.json"
+INDEX_FILE_NAME = "index.faiss"
+TEMP_FOLDER_PREFIX = ".tmp_"
+
+_reference_index_store = None
+_reference_index_store_lock = threading.Lock()
+
+
+def get_reference_index_store():
+    """Returns the reference index store of the process, shared by every
+    thread so each url has one lock and is built once."""
+    global _reference_index_store
+    with _reference_index_store_lock:
+        if _reference_index_store is None:
+            _reference_index_store = ReferenceIndexStore()
+        return _reference_index_store
+
+
+class ReferenceIndexStore:
+    """On disk FAISS indexes of best practice reference pages.
+
+    Every page has one folder keyed by its url, with the index and the page
+    metadata. A page is revalidated with its ETag and Last-Modified headers
+    and only split and embedded again when its content hash changed. Folder
+    mtime is used as the last access time, the least recently used indexes
+    are removed once the folder grows above its size limit.
+
+    Loaded indexes are kept in memory for REFERENCE_INDEX_MEMORY_TTL seconds
+    and dropped together with their folder, so memory stays within the disk
+    limit and a long lived process still picks up changed pages.
+    """
+
+    def __init__(self, folder_path=REFERENCE_INDEX_FOLDER_PATH):
+        self.folder_path = folder_path
+        self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
+        self.session = requests.Session()
+        # {url: (index, monotonic time it was loaded)}
+        self.indexes = {}
+        self.url_locks = {}
+        self.lock = threading.Lock()
+        # An index is only reused with the embeddings and splitting it was built with
+        self.index_version = create_hash(
+            f"{EMBEDING_MODEL}\n{EMBEDDING_DIMENSIONS}\n{DOCUMENTATION_SPLIT_MODEL}\n"
+            f"{DOCUMENTATION_CHUNK_TOKEN_LIMIT}\n{DOCUMENTATION_CHUNK_OVERLAP}"
+        )
+
+    def _get_url_lock(self, url):
+        with self.lock:
+            return self.url_locks.setdefault(url, threading.Lock())
+
+    def _get_index_path(self, url):
+        return os.path.join(self.folder_path, create_hash(url))
+
+    def _read_metadata(self, index_path):
+        try:
+            with open(os.path.join(index_path, METADATA_FILE_NAME)) as metadata_file:
+                metadata = json.load(metadata_file)
+            if metadata.get("index_version") == self.index_version and os.path.isfile(
+                os.path.join(index_path, INDEX_FILE_NAME)
+            ):
+                return metadata
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _write_metadata(self, index_path, metadata):
+        with open(os.path.join(index_path, METADATA_FILE_NAME), "w") as metadata_file:
+            json.dump(metadata, metadata_file)
+
+    def _fetch_page(self, url, metadata):
+        headers = {}
+        if metadata and metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata and metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+        response = self.session.get(
+            url, headers=headers, timeout=REFERENCE_PAGE_REQUEST_TIMEOUT
+        )
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def _load_index(self, index_path):
+        return FAISS.load_local(
+            index_path,
+            get_embeddings(EMBEDING_MODEL, EMBEDDING_DIMENSIONS),
+            allow_dangerous_deserialization=True,
+        )
+
+    def _build_index(self, url, page_html):
+        soup = BeautifulSoup(page_html, "html.parser")
+        documents = [
+            Document(
+                page_content=soup.get_text(),
+                metadata={
+                    "source": url,
+                    "title": soup.title.get_text() if soup.title else "",
+                },
+            )
+        ]
+        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            model_name=DOCUMENTATION_SPLIT_MODEL,
+            chunk_size=DOCUMENTATION_CHUNK_TOKEN_LIMIT,
+            chunk_overlap=DOCUMENTATION_CHUNK_OVERLAP,
+        )
+        return FAISS.from_documents(
+            text_splitter.split_documents(documents),
+            get_embeddings(EMBEDING_MODEL, EMBEDDING_DIMENSIONS),
+        )
+
+    def _save_index(self, index_path, vector_store, metadata):
+        os.makedirs(self.folder_path, exist_ok=True)
+        # The index is written to a temporary folder and swapped in with
+        # renames, a reader finds either a complete index or none at all.
+        temp_path = tempfile.mkdtemp(prefix=TEMP_FOLDER_PREFIX, dir=self.folder_path)
+        old_path = None
+        try:
+            vector_store.save_local(temp_path)
+            self._write_metadata(temp_path, metadata)
+            if os.path.isdir(index_path):
+                old_path = tempfile.mkdtemp(prefix=TEMP_FOLDER_PREFIX, dir=self.folder_path)
+                os.rename(index_path, os.path.join(old_path, "index"))
+            os.rename(temp_path, index_path)
+        except OSError as e:
+            # Another process swapped in its index of the page first
+            if not os.path.isdir(index_path):
+                raise
+            self.logger.info(f"Keeping the reference index saved by another process: {e}")
+        finally:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            if old_path:
+                shutil.rmtree(old_path, ignore_errors=True)
+
+    def _refresh_index(self, url):
+        index_path = self._get_index_path(url)
+        metadata = self._read_metadata(index_path)
+        try:
+            response = self._fetch_page(url, metadata)
+        except requests.RequestException as e:
+            if metadata is None:
+                raise
+            self.logger.error(f"Using cached reference index of {url}, revalidation failed: {e}")
+            return self._load_index(index_path)
+
+        if response.status_code == 304:
+            self.logger.info(f"Reference page {url} is not modified")
+            return self._load_index(index_path)
+
+        content_hash = create_hash(response.text)
+        new_metadata = {
+            "url": url,
+            "index_version": self.index_version,
+            "content_hash": content_hash,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        if metadata and metadata.get("content_hash") == content_hash:
+            self.logger.info(f"Content of reference page {url} is unchanged")
+            self._write_metadata(index_path, new_metadata)
+            return self._load_index(index_path)
+
+        self.logger.info(f"Building reference index of {url}")
+        vector_store = self._build_index(url, response.text)
+        self._save_index(index_path, vector_store, new_metadata)
+        return vector_store
+
+    def _get_loaded_index(self, url):
+        loaded_index = self.indexes.get(url)
+        if loaded_index and time.monotonic() - loaded_index[1] < REFERENCE_INDEX_MEMORY_TTL:
+            return loaded_index[0]
+        return None
+
+    def get_index(self, url):
+        """Returns the FAISS index of the reference page, fetched and embedded
+        only when it is not cached or changed since it was cached."""
+        vector_store = self._get_loaded_index(url)
+        if vector_store is not None:
+            return vector_store
+
+        with self._get_url_lock(url):
+            vector_store = self._get_loaded_index(url)
+            if vector_store is None:
+                vector_store = self._refresh_index(url)
+                self.indexes[url] = (vector_store, time.monotonic())
+                os.utime(self._get_index_path(url))
+                self.evict_indexes(keep=self._get_index_path(url))
+        return vector_store
+
+    def _get_folder_size(self, folder_path):
+        total_size = 0
+        for root, _, files in os.walk(folder_path):
+            for file in files:
+                try:
+                    total_size += os.path.getsize(os.path.join(root, file))
+                except OSError:
+                    continue
+        return total_size
+
+    def evict_indexes(self, keep=None):
+        with self.lock:
+            if not os.path.isdir(self.folder_path):
+                return
+            indexes = []
+            for item in os.listdir(self.folder_path):
+                full_path = os.path.join(self.folder_path, item)
+                # Indexes being written are not evicted
+                if os.path.isdir(full_path) and not item.startswith(TEMP_FOLDER_PREFIX):
+                    indexes.append(
+                        (os.path.getmtime(full_path), full_path, self._get_folder_size(full_path))
+                    )
+
+            total_size = sum(size for _, _, size in indexes)
+            evicted_paths = set()
+            for _, full_path, size in sorted(indexes):
+                if total_size <= REFERENCE_INDEX_MAX_SIZE_BYTES:
+                    break
+                if full_path == keep:
+                    continue
+                shutil.rmtree(full_path, ignore_errors=True)
+                total_size -= size
+                evicted_paths.add(full_path)
+
+            for url in [
+                url for url in self.indexes if self._get_index_path(url) in evicted_paths
+            ]:
+                self.indexes.pop(url, None)
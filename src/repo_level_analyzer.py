@@ -1,14 +1,13 @@
 from utils.constants import (
     REPO_LEVEL_PRACTICE_EVALUATION_PROMPT,
     LOG_FILE_PATH,
-    AI71_BASE_URL,
-    MODEL_NAME
+    LLM_PRIORITY_ANALYSIS,
 )
 from ast import literal_eval
 from utils.utilities import extract_list_of_lists
 from utils.logger_manager import CustomLogger
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
+from llm_scheduler import LLMScheduler, estimate_tokens
+from llm_registry import get_prompt_chain
 import json
 
 
@@ -24,23 +23,25 @@ class RepoLevelAnalyzer:
         frameworks = f"the frameworks '{self.frameworks}'" if self.frameworks else ""
         
         try:
-            model = ChatOpenAI(
-                temperature = 0, 
-                model_name = MODEL_NAME, 
-                base_url=AI71_BASE_URL
+            chain = get_prompt_chain(
+                REPO_LEVEL_PRACTICE_EVALUATION_PROMPT,
+                ["best_practices", "directory_structure", "frameworks"],
+                temperature=0,
             )
-            prompt_template = PromptTemplate(
-                template=REPO_LEVEL_PRACTICE_EVALUATION_PROMPT,
-                input_variables=["best_practices", "directory_structure", "frameworks"],
-            )
-            chain = prompt_template | model
-            result = chain.invoke(
+            result = LLMScheduler().submit(
+                chain.invoke,
                 {
                     "best_practices": self.best_practices, 
                     "directory_structure": self.directory_structure, 
                     "frameworks": frameworks,
-                }
-            )
+                },
+                priority=LLM_PRIORITY_ANALYSIS,
+                tokens=estimate_tokens(
+                    REPO_LEVEL_PRACTICE_EVALUATION_PROMPT,
+                    self.best_practices,
+                    self.directory_structure,
+                ),
+            ).result()
             final_response = self.format_output(result.content)
         except ValueError as e:
             return {}
@@ -0,0 +1,159 @@
+import os
+import re
+
+from utils.logger_manager import CustomLogger
+from utils.constants import (
+    LOG_FILE_PATH,
+    FILE_EXTENSIONS,
+    IGNORED_DIRECTORIES,
+    MAX_ANALYZABLE_FILE_SIZE_BYTES,
+    BINARY_DETECTION_BYTES,
+)
+
+
+class GitIgnoreRule:
+    def __init__(self, pattern, base_path):
+        self.base_path = base_path
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # Patterns with a slash (other than a trailing one) are anchored to the
+        # .gitignore folder, others match the name at any depth.
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        prefix = "" if anchored else "(?:.*/)?"
+        self.regex = re.compile(prefix + self._translate(pattern) + "$")
+
+    def _translate(self, pattern):
+        regex = ""
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith("**/", i):
+                regex += "(?:.*/)?"
+                i += 3
+            elif pattern.startswith("**", i):
+                regex += ".*"
+                i += 2
+            elif pattern[i] == "*":
+                regex += "[^/]*"
+                i += 1
+            elif pattern[i] == "?":
+                regex += "[^/]"
+                i += 1
+            elif pattern[i] == "[" and "]" in pattern[i + 1 :]:
+                end = pattern.index("]", i + 1)
+                regex += pattern[i : end + 1]
+                i = end + 1
+            else:
+                regex += re.escape(pattern[i])
+                i += 1
+        return regex
+
+    def match(self, path, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        relative_path = os.path.relpath(path, self.base_path).replace(os.sep, "/")
+        return bool(self.regex.match(relative_path))
+
+
+class RepoWalker:
+    """Walks a repository once and collects both the analyzable files and
+    the project structure text."""
+
+    def __init__(
+        self,
+        root_path,
+        file_extensions=FILE_EXTENSIONS,
+        max_file_size=MAX_ANALYZABLE_FILE_SIZE_BYTES,
+    ):
+        self.root_path = root_path
+        self.file_extensions = tuple(file_extensions)
+        self.max_file_size = max_file_size
+        self.ignored_directories = set(IGNORED_DIRECTORIES)
+        self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
+
+    def _read_gitignore(self, folder_path, rules):
+        gitignore_path = os.path.join(folder_path, ".gitignore")
+        if not os.path.isfile(gitignore_path):
+            return rules
+        new_rules = list(rules)
+        try:
+            with open(gitignore_path, "r", encoding="utf-8", errors="ignore") as file:
+                for line in file:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        new_rules.append(GitIgnoreRule(line, folder_path))
+        except OSError as e:
+            self.logger.error(f"Error while reading {gitignore_path}: {e}")
+        return new_rules
+
+    def _is_ignored(self, path, is_dir, rules):
+        ignored = False
+        for rule in rules:
+            if rule.match(path, is_dir):
+                ignored = not rule.negate
+        return ignored
+
+    def _is_binary(self, path):
+        try:
+            with open(path, "rb") as file:
+                return b"\0" in file.read(BINARY_DETECTION_BYTES)
+        except OSError:
+            return True
+
+    def _is_analyzable(self, entry):
+        if not entry.name.endswith(self.file_extensions):
+            return False
+        try:
+            if entry.stat().st_size > self.max_file_size:
+                self.logger.info(f"Skipping large file: {entry.path}")
+                return False
+        except OSError:
+            return False
+        return not self._is_binary(entry.path)
+
+    def _scan_folder(self, folder_path, depth, rules):
+        try:
+            with os.scandir(folder_path) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            self.logger.error(f"Error while scanning {folder_path}: {e}")
+            return []
+
+        children = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if self._is_ignored(entry.path, is_dir, rules):
+                continue
+            children.append((entry, is_dir, depth, rules))
+        return children
+
+    def walk(self):
+        """Returns the analyzable file paths and the project structure text."""
+        files = []
+        structure_lines = []
+        root_rules = self._read_gitignore(self.root_path, [])
+        stack = list(reversed(self._scan_folder(self.root_path, 0, root_rules)))
+
+        while stack:
+            entry, is_dir, depth, rules = stack.pop()
+            if is_dir:
+                structure_lines.append("  " * depth + f"/{entry.name}\n")
+                # Vendored and build folders are listed but never descended into.
+                if entry.name in self.ignored_directories:
+                    continue
+                folder_rules = self._read_gitignore(entry.path, rules)
+                stack.extend(
+                    reversed(self._scan_folder(entry.path, depth + 1, folder_rules))
+                )
+            else:
+                structure_lines.append("  " * depth + f"|-- {entry.name}\n")
+                if self._is_analyzable(entry):
+                    files.append(entry.path)
+
+        self.logger.info(f"Found {len(files)} analyzable files in {self.root_path}")
+        return files, "".join(structure_lines)
@@ -0,0 +1,94 @@
+import queue
+import threading
+
+from knowledge_db import DB
+from utils.logger_manager import CustomLogger
+from utils.constants import (
+    LOG_FILE_PATH,
+    RESULT_WRITER_THREAD_NAME,
+    RESULT_WRITER_BATCH_SIZE,
+    RESULT_WRITER_FLUSH_INTERVAL,
+)
+
+_CHUNK_RESPONSES = "chunk"
+_FILE_RESPONSES = "file"
+
+
+class ResultWriter:
+    """Write-behind persistence of analysis results.
+
+    Results are queued by the analysis as they complete and one background
+    thread stores them in batched transactions on its own connection, so
+    commits stay off the critical path and the verdicts computed before a
+    crash are already in the knowledge store.
+    """
+
+    def __init__(
+        self,
+        batch_size=RESULT_WRITER_BATCH_SIZE,
+        flush_interval=RESULT_WRITER_FLUSH_INTERVAL,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.db_store = DB()
+        self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
+        self.thread = threading.Thread(
+            target=self._work, name=RESULT_WRITER_THREAD_NAME, daemon=True
+        )
+        self.thread.start()
+
+    def add_chunk_responses(self, chunk_responses):
+        """Queues {(chunk hash, practice set hash, version): response}"""
+        if chunk_responses:
+            self.queue.put((_CHUNK_RESPONSES, chunk_responses))
+
+    def add_file_responses(self, file_responses):
+        """Queues {(file hash, best practice hash): response}"""
+        if file_responses:
+            self.queue.put((_FILE_RESPONSES, file_responses))
+
+    def close(self):
+        """Writes every queued result and stops the thread"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _next_batch(self):
+        # The batch size counts results, a queued item holds the results of
+        # a chunk or a file.
+        batch = [self.queue.get()]
+        result_count = len(batch[-1][1]) if batch[-1] is not None else 0
+        while batch[-1] is not None and result_count < self.batch_size:
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                break
+            if batch[-1] is not None:
+                result_count += len(batch[-1][1])
+        return batch
+
+    def _write(self, batch):
+        chunk_responses = {}
+        file_responses = {}
+        for kind, responses in batch:
+            if kind == _CHUNK_RESPONSES:
+                chunk_responses.update(responses)
+            else:
+                file_responses.update(responses)
+        if chunk_responses:
+            self.db_store.add_chunk_responses(chunk_responses)
+        if file_responses:
+            self.db_store.add_file_responses(file_responses)
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            closed = batch[-1] is None
+            if closed:
+                batch.pop()
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.logger.error(f"Error while writing analysis results: {e}")
+            if closed:
+                return
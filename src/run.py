@@ -1,68 +1,139 @@
 import json
 import os
+import asyncio
 from code_loader import CodeLoader
 from practice_loader import PracticeLoader
 from file_filter import FileFilter
 from keyword_generator import KwGenerator
+from file_snapshot import FileSnapshotStore
 from utils.utilities import (
     get_code_related_practices,
     filter_best_practices,
     generate_final_response
 )
 from code_level_analyzer import CodeAnalyzer
+from async_code_level_analyzer import AsyncCodeAnalyzer
 from repo_level_analyzer import RepoLevelAnalyzer
 from dotenv import load_dotenv
 load_dotenv()
 
 
-def run(repo_link, best_practices_doc_link,username,password):
-    try:
-        code_loader = CodeLoader(
-            code_link=repo_link,
-            username="",
-            password="",
-        )
+def prepare_code_analysis(
+    code_loader,
+    best_practices_doc_link,
+    username,
+    password,
+    base_ref=None,
+    head_ref=None,
+    changed_hunks_only=False,
+    parent_page_id=None,
+):
+    """Runs the stages before the code level analysis and returns the
+    arguments of the code analyzer."""
+    code_files = code_loader.load_code_files()
+    changed_files = None
+    changed_line_ranges = None
+    if base_ref:
+        # Pull request mode: only the files changed between the refs are analyzed
+        head = head_ref or "HEAD"
+        changed_files = code_loader.get_changed_files(base_ref, head)
+        if changed_hunks_only:
+            changed_line_ranges = code_loader.get_changed_line_ranges(base_ref, head)
 
-        code_files = code_loader.load_code_files()
-        project_frameworks = code_loader.get_project_framework()
-        practice_loader = PracticeLoader(
-            best_practices_doc_link, project_frameworks, username, password
-        )
+    project_frameworks = code_loader.get_project_framework()
+    practice_loader = PracticeLoader(
+        best_practices_doc_link,
+        project_frameworks,
+        username,
+        password,
+        parent_page_id=parent_page_id,
+    )
 
-        practice_dict_list = practice_loader.process_best_practices()
-        code_related_practices = get_code_related_practices(
-            practice_dict_list, "is_repo_level", False
-        )
+    practice_dict_list = practice_loader.process_best_practices()
+    code_related_practices = get_code_related_practices(
+        practice_dict_list, "is_repo_level", False
+    )
 
-        generator = KwGenerator(code_related_practices, project_frameworks)
-        best_practices_with_keywords = generator.get_practices_with_keywords()
+    # Every stage shares one read of each file for the whole run
+    snapshot_store = FileSnapshotStore()
+    generator = KwGenerator(
+        code_related_practices, project_frameworks, code_files, snapshot_store
+    )
+    best_practices_with_keywords = generator.get_practices_with_keywords()
 
-        filter = FileFilter(code_files, best_practices_with_keywords)
-        files = filter.read_files()
+    filter = FileFilter(
+        code_files,
+        best_practices_with_keywords,
+        snapshot_store,
+        changed_files=changed_files,
+    )
+    files = filter.read_files()
 
-        code_level_response = CodeAnalyzer(
-            project_frameworks, files, practice_dict_list
-        ).execute_file_analyze()
+    return {
+        "project_frameworks": project_frameworks,
+        "file_practice_mapping": files,
+        "processed_best_practice_dict_list": practice_dict_list,
+        "changed_files": changed_files,
+        "changed_line_ranges": changed_line_ranges,
+        "snapshot_store": snapshot_store,
+        "practice_line_ranges": filter.practice_line_ranges,
+        "root_path": code_loader.code_link,
+    }
 
-        repo_best_practices = filter_best_practices(
-            practice_dict_list, "is_repo_level", True
+
+def finish_analysis(code_loader, analyzer_arguments, code_level_response):
+    practice_dict_list = analyzer_arguments["processed_best_practice_dict_list"]
+    repo_best_practices = filter_best_practices(
+        practice_dict_list, "is_repo_level", True
+    )
+    repo_level_response = RepoLevelAnalyzer(
+        code_loader.get_structure_summary(),
+        analyzer_arguments["project_frameworks"],
+        repo_best_practices,
+    ).execute_analyze()
+    if repo_level_response:
+        code_level_response[code_loader.code_link] = (
+            repo_level_response
         )
-        repo_level_response = RepoLevelAnalyzer(
-            code_loader.project_structure,
-            project_frameworks,
-            repo_best_practices,
-        ).execute_analyze()
-        if repo_level_response:
-            code_level_response[code_loader.code_link] = (
-                repo_level_response
-            )
-        
-        final_response = generate_final_response(
-            code_level_response,
-            practice_dict_list,
+
+    final_response = generate_final_response(
+        code_level_response,
+        practice_dict_list,
+    )
+    print(final_response)
+    return final_response
+
+
+def run(
+    repo_link,
+    best_practices_doc_link,
+    username,
+    password,
+    base_ref=None,
+    head_ref=None,
+    changed_hunks_only=False,
+    parent_page_id=None,
+):
+    code_loader = CodeLoader(
+        code_link=repo_link,
+        username="",
+        password="",
+        head_ref=head_ref,
+        keep_history=bool(base_ref),
+    )
+    try:
+        analyzer_arguments = prepare_code_analysis(
+            code_loader,
+            best_practices_doc_link,
+            username,
+            password,
+            base_ref,
+            head_ref,
+            changed_hunks_only,
+            parent_page_id,
         )
-        print(final_response)
-        return final_response
+        code_level_response = CodeAnalyzer(**analyzer_arguments).execute_file_analyze()
+        return finish_analysis(code_loader, analyzer_arguments, code_level_response)
     except (
         ValueError,
         Exception,
@@ -72,5 +143,47 @@ def run(repo_link, best_practices_doc_link,username,password):
         # Cleanup
         code_loader.delete_folder()
 
+
+async def arun(
+    repo_link,
+    best_practices_doc_link,
+    username,
+    password,
+    base_ref=None,
+    head_ref=None,
+    changed_hunks_only=False,
+    parent_page_id=None,
+):
+    """Async entry point of run. The code level analysis runs on the event
+    loop, the blocking stages around it run on a worker thread."""
+    code_loader = CodeLoader(
+        code_link=repo_link,
+        username="",
+        password="",
+        head_ref=head_ref,
+        keep_history=bool(base_ref),
+    )
+    try:
+        analyzer_arguments = await asyncio.to_thread(
+            prepare_code_analysis,
+            code_loader,
+            best_practices_doc_link,
+            username,
+            password,
+            base_ref,
+            head_ref,
+            changed_hunks_only,
+            parent_page_id,
+        )
+        code_level_response = await AsyncCodeAnalyzer(
+            **analyzer_arguments
+        ).aexecute_file_analyze()
+        return await asyncio.to_thread(
+            finish_analysis, code_loader, analyzer_arguments, code_level_response
+        )
+    finally:
+        # Cleanup
+        await asyncio.to_thread(code_loader.delete_folder)
+
 if __name__ == "__main__":
     run("github link", "best practice doc link", "username", "password")
@@ -0,0 +1,31 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Thread safe memo where concurrent callers of the same key share one call.
+
+    The first caller of a key runs the function and every other caller waits
+    for its result, later callers get the memoized result. A failed call is
+    not memoized, its waiters get the exception and the next caller retries.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.futures = {}
+
+    def do(self, key, func, *args, **kwargs):
+        with self.lock:
+            future = self.futures.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = self.futures[key] = Future()
+
+        if is_owner:
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                with self.lock:
+                    del self.futures[key]
+                future.set_exception(e)
+        return future.result()
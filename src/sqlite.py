@@ -1,15 +1,21 @@
 import sqlite3
 import json
-import hashlib
 from datetime import datetime
 
 from utils.logger_manager import CustomLogger
+from utils.utilities import clean_text, create_hash
 from utils.constants import (
     LOG_FILE_PATH,
     SQLITE_KEYWORD_TABLE_NAME,
     SQLITE_FILE_TABLE_NAME,
+    SQLITE_FRAMEWORK_TABLE_NAME,
+    SQLITE_STRUCTURE_TABLE_NAME,
+    SQLITE_CONFLUENCE_TABLE_NAME,
+    SQLITE_PRACTICE_TABLE_NAME,
+    SQLITE_TOKEN_TABLE_NAME,
+    SQLITE_CHUNK_TABLE_NAME,
     SQLITE_DB_NAME,
-    IGNORE_CHARS,
+    SQLITE_MAX_QUERY_VARIABLES,
 )
 
 
@@ -19,17 +25,27 @@ class SQLite:
         db_name=SQLITE_DB_NAME,
         keyword_table_name=SQLITE_KEYWORD_TABLE_NAME,
         file_table_name=SQLITE_FILE_TABLE_NAME,
+        framework_table_name=SQLITE_FRAMEWORK_TABLE_NAME,
+        structure_table_name=SQLITE_STRUCTURE_TABLE_NAME,
+        confluence_table_name=SQLITE_CONFLUENCE_TABLE_NAME,
+        practice_table_name=SQLITE_PRACTICE_TABLE_NAME,
+        token_table_name=SQLITE_TOKEN_TABLE_NAME,
+        chunk_table_name=SQLITE_CHUNK_TABLE_NAME,
     ):
         self.conn = sqlite3.connect(db_name, check_same_thread=False)
         self.keyword_table_name = keyword_table_name
         self.file_table_name = file_table_name
+        self.framework_table_name = framework_table_name
+        self.structure_table_name = structure_table_name
+        self.confluence_table_name = confluence_table_name
+        self.practice_table_name = practice_table_name
+        self.token_table_name = token_table_name
+        self.chunk_table_name = chunk_table_name
         self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
         self._create_table()
 
     def _create_hash(self, input):
-        hasher = hashlib.sha256()
-        hasher.update(input.encode("utf-8"))
-        return hasher.hexdigest()
+        return create_hash(input)
 
     def _create_table(self):
         try:
@@ -54,13 +70,93 @@ class SQLite:
                 "PRIMARY KEY (file_hash, best_practice_hash)"
                 ")"
             )
+            # Create framework table if it does not exist
+            create_framework_table_query = (
+                f"CREATE TABLE IF NOT EXISTS {self.framework_table_name} ("
+                "structure_hash TEXT PRIMARY KEY,"
+                "frameworks TEXT,"
+                "updated_by TEXT,"
+                "updated_at DATETIME"
+                ")"
+            )
+            # Create structure summary table if it does not exist
+            create_structure_table_query = (
+                f"CREATE TABLE IF NOT EXISTS {self.structure_table_name} ("
+                "source_hash TEXT,"
+                "token_budget INTEGER,"
+                "summary TEXT,"
+                "updated_by TEXT,"
+                "updated_at DATETIME,"
+                "PRIMARY KEY (source_hash, token_budget)"
+                ")"
+            )
+            # Create confluence page table if it does not exist
+            create_confluence_table_query = (
+                f"CREATE TABLE IF NOT EXISTS {self.confluence_table_name} ("
+                "base_url TEXT,"
+                "page_id TEXT,"
+                "version INTEGER,"
+                "content TEXT,"
+                "updated_by TEXT,"
+                "updated_at DATETIME,"
+                "PRIMARY KEY (base_url, page_id)"
+                ")"
+            )
+            # Create processed practice table if it does not exist
+            create_practice_table_query = (
+                f"CREATE TABLE IF NOT EXISTS {self.practice_table_name} ("
+                "content_hash TEXT,"
+                "framework_hash TEXT,"
+                "practices JSON,"
+                "updated_by TEXT,"
+                "updated_at DATETIME,"
+                "PRIMARY KEY (content_hash, framework_hash)"
+                ")"
+            )
+            # Create file token table if it does not exist
+            create_token_table_query = (
+                f"CREATE TABLE IF NOT EXISTS {self.token_table_name} ("
+                "file_hash TEXT PRIMARY KEY,"
+                "tokens JSON,"
+                "updated_by TEXT,"
+                "updated_at DATETIME"
+                ")"
+            )
+            # Create chunk response table if it does not exist
+            create_chunk_table_query = (
+                f"CREATE TABLE IF NOT EXISTS {self.chunk_table_name} ("
+                "chunk_hash TEXT,"
+                "practice_set_hash TEXT,"
+                "version TEXT,"
+                "response JSON,"
+                "updated_by TEXT,"
+                "updated_at DATETIME,"
+                "PRIMARY KEY (chunk_hash, practice_set_hash, version)"
+                ")"
+            )
             self.conn.execute(create_keyword_table_query)
             self.conn.execute(create_file_table_query)
+            self.conn.execute(create_framework_table_query)
+            self.conn.execute(create_structure_table_query)
+            self._drop_table_without_column(self.confluence_table_name, "base_url")
+            self.conn.execute(create_confluence_table_query)
+            self.conn.execute(create_practice_table_query)
+            self.conn.execute(create_token_table_query)
+            self.conn.execute(create_chunk_table_query)
             self.conn.commit()
         except Exception as e:
             self.logger.error(f"Error while creating SQLite DB tables: {e}")
             raise
 
+    def _drop_table_without_column(self, table_name, column_name):
+        # Cache tables of an older layout are dropped and created again
+        columns = [
+            row[1] for row in self.conn.execute(f"PRAGMA table_info({table_name})")
+        ]
+        if columns and column_name not in columns:
+            self.logger.info(f"Dropping SQLite table {table_name} of an older layout")
+            self.conn.execute(f"DROP TABLE {table_name}")
+
     def insert_best_practice(self, best_practice, keywords):
         try:
             self.logger.info(
@@ -91,6 +187,37 @@ class SQLite:
             )
             raise
 
+    def insert_best_practices_bulk(self, practice_keywords):
+        try:
+            self.logger.info(
+                f"Inserting {len(practice_keywords)} best practices in {self.keyword_table_name} table"
+            )
+            updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            insert_query = (
+                f"INSERT OR REPLACE INTO {self.keyword_table_name} "
+                "(best_practice_hash, keywords, updated_by, updated_at) "
+                "VALUES (?, ?, ?, ?)"
+            )
+            # Single transaction for the whole batch
+            with self.conn:
+                self.conn.executemany(
+                    insert_query,
+                    [
+                        (
+                            self._create_hash(self._clean_text(best_practice)),
+                            json.dumps(keywords),
+                            "admin",
+                            updated_at,
+                        )
+                        for best_practice, keywords in practice_keywords.items()
+                    ],
+                )
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting best practices in SQLite table {self.keyword_table_name}: {e}"
+            )
+            raise
+
     def insert_file(self, file_code, best_practice, response):
         try:
             self.logger.info(
@@ -119,6 +246,31 @@ class SQLite:
             )
             raise
 
+    def insert_files_by_hash_bulk(self, file_responses):
+        try:
+            self.logger.info(
+                f"Inserting {len(file_responses)} file responses in {self.file_table_name} table"
+            )
+            updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            insert_query = (
+                f"INSERT OR REPLACE INTO {self.file_table_name} "
+                "(file_hash, best_practice_hash, response, updated_by, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)"
+            )
+            with self.conn:
+                self.conn.executemany(
+                    insert_query,
+                    [
+                        (file_hash, best_practice_hash, json.dumps(response), "admin", updated_at)
+                        for (file_hash, best_practice_hash), response in file_responses.items()
+                    ],
+                )
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting file responses in SQLite table {self.file_table_name}: {e}"
+            )
+            raise
+
     def query_file(self, file_code, best_practice):
         try:
             self.logger.info(
@@ -141,10 +293,34 @@ class SQLite:
             )
             raise
 
+    def query_files_by_hash_bulk(self, file_practice_hashes):
+        """Returns {(file hash, best practice hash): response} of the cached pairs"""
+        try:
+            self.logger.info(
+                f"Querying {len(file_practice_hashes)} file responses in SQLite table {self.file_table_name}"
+            )
+            file_practice_hashes = set(file_practice_hashes)
+            file_hashes = list({file_hash for file_hash, _ in file_practice_hashes})
+            file_responses = {}
+            for i in range(0, len(file_hashes), SQLITE_MAX_QUERY_VARIABLES):
+                hash_chunk = file_hashes[i : i + SQLITE_MAX_QUERY_VARIABLES]
+                placeholders = ", ".join("?" * len(hash_chunk))
+                file_select_query = (
+                    "select file_hash, best_practice_hash, response "
+                    f"from {self.file_table_name} as ks where ks.file_hash in ({placeholders})"
+                )
+                for row in self.conn.execute(file_select_query, hash_chunk):
+                    if row[:2] in file_practice_hashes:
+                        file_responses[row[:2]] = json.loads(row[2])
+            return file_responses
+        except Exception as e:
+            self.logger.error(
+                f"Error while checking for file responses in SQLite table {self.file_table_name}: {e}"
+            )
+            raise
+
     def _clean_text(self, best_practice):
-        for ch in IGNORE_CHARS:
-            best_practice = best_practice.replace(ch, "")
-        return best_practice
+        return clean_text(best_practice)
 
     def get_keywords(self, best_practice):
         try:
@@ -167,6 +343,313 @@ class SQLite:
             )
             raise
 
+    def insert_framework(self, project_structure, frameworks):
+        try:
+            self.logger.info(
+                f"Inserting frameworks '{frameworks}' in {self.framework_table_name} table"
+            )
+            # Create hash for the project structure
+            structure_hash = self._create_hash(project_structure)
+
+            insert_query = (
+                f"INSERT OR REPLACE INTO {self.framework_table_name} "
+                "(structure_hash, frameworks, updated_by, updated_at) "
+                "VALUES (?, ?, ?, ?)"
+            )
+            self.conn.execute(
+                insert_query,
+                (
+                    structure_hash,
+                    frameworks,
+                    "admin",
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting frameworks in SQLite table {self.framework_table_name}: {e}"
+            )
+            raise
+
+    def query_framework(self, project_structure):
+        try:
+            self.logger.info(
+                f"Querying frameworks of project structure in SQLite table {self.framework_table_name}"
+            )
+            structure_hash = self._create_hash(project_structure)
+
+            framework_select_query = f"select * from {self.framework_table_name} as fs where fs.structure_hash = ?"
+            res = self.conn.execute(
+                framework_select_query, (structure_hash,)
+            ).fetchone()
+            if res:
+                return res[1]
+        except Exception as e:
+            self.logger.error(
+                f"Error while checking for frameworks in SQLite table {self.framework_table_name}: {e}"
+            )
+            raise
+
+    def insert_structure_summary(self, source, token_budget, summary):
+        try:
+            self.logger.info(
+                f"Inserting project structure summary in {self.structure_table_name} table"
+            )
+            source_hash = self._create_hash(source)
+
+            insert_query = (
+                f"INSERT OR REPLACE INTO {self.structure_table_name} "
+                "(source_hash, token_budget, summary, updated_by, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)"
+            )
+            self.conn.execute(
+                insert_query,
+                (
+                    source_hash,
+                    token_budget,
+                    summary,
+                    "admin",
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting structure summary in SQLite table {self.structure_table_name}: {e}"
+            )
+            raise
+
+    def query_structure_summary(self, source, token_budget):
+        try:
+            self.logger.info(
+                f"Querying project structure summary in SQLite table {self.structure_table_name}"
+            )
+            source_hash = self._create_hash(source)
+
+            summary_select_query = f"select * from {self.structure_table_name} as ss where ss.source_hash = ? and ss.token_budget = ?"
+            res = self.conn.execute(
+                summary_select_query, (source_hash, token_budget)
+            ).fetchone()
+            if res:
+                return res[2]
+        except Exception as e:
+            self.logger.error(
+                f"Error while checking for structure summary in SQLite table {self.structure_table_name}: {e}"
+            )
+            raise
+
+    def insert_confluence_page(self, base_url, page_id, version, content):
+        try:
+            self.logger.info(
+                f"Inserting confluence page '{page_id}' of {base_url} version {version} in {self.confluence_table_name} table"
+            )
+            insert_query = (
+                f"INSERT OR REPLACE INTO {self.confluence_table_name} "
+                "(base_url, page_id, version, content, updated_by, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)"
+            )
+            self.conn.execute(
+                insert_query,
+                (
+                    base_url,
+                    page_id,
+                    version,
+                    content,
+                    "admin",
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting confluence page in SQLite table {self.confluence_table_name}: {e}"
+            )
+            raise
+
+    def query_confluence_page(self, base_url, page_id):
+        try:
+            self.logger.info(
+                f"Querying confluence page '{page_id}' of {base_url} in SQLite table {self.confluence_table_name}"
+            )
+            page_select_query = (
+                f"select version, content from {self.confluence_table_name} as cs "
+                "where cs.base_url = ? and cs.page_id = ?"
+            )
+            res = self.conn.execute(page_select_query, (base_url, page_id)).fetchone()
+            if res:
+                return res[0], res[1]
+        except Exception as e:
+            self.logger.error(
+                f"Error while checking for confluence page in SQLite table {self.confluence_table_name}: {e}"
+            )
+            raise
+
+    def insert_processed_practices(self, raw_practice_data, frameworks, practices):
+        try:
+            self.logger.info(
+                f"Inserting processed practices in {self.practice_table_name} table"
+            )
+            insert_query = (
+                f"INSERT OR REPLACE INTO {self.practice_table_name} "
+                "(content_hash, framework_hash, practices, updated_by, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)"
+            )
+            self.conn.execute(
+                insert_query,
+                (
+                    self._create_hash(raw_practice_data),
+                    self._create_hash(frameworks),
+                    json.dumps(practices),
+                    "admin",
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
+            self.conn.commit()
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting processed practices in SQLite table {self.practice_table_name}: {e}"
+            )
+            raise
+
+    def query_processed_practices(self, raw_practice_data, frameworks):
+        try:
+            self.logger.info(
+                f"Querying processed practices in SQLite table {self.practice_table_name}"
+            )
+            practice_select_query = f"select * from {self.practice_table_name} as ps where ps.content_hash = ? and ps.framework_hash = ?"
+            res = self.conn.execute(
+                practice_select_query,
+                (self._create_hash(raw_practice_data), self._create_hash(frameworks)),
+            ).fetchone()
+            if res:
+                return json.loads(res[2])
+        except Exception as e:
+            self.logger.error(
+                f"Error while checking for processed practices in SQLite table {self.practice_table_name}: {e}"
+            )
+            raise
+
+    def get_keywords_bulk(self, best_practices):
+        try:
+            self.logger.info(
+                f"Querying keywords for {len(best_practices)} best practices in SQLite table {self.keyword_table_name}"
+            )
+            hash_to_practice = {
+                self._create_hash(self._clean_text(best_practice)): best_practice
+                for best_practice in best_practices
+            }
+            hashes = list(hash_to_practice)
+            keywords = {}
+            for i in range(0, len(hashes), SQLITE_MAX_QUERY_VARIABLES):
+                hash_chunk = hashes[i : i + SQLITE_MAX_QUERY_VARIABLES]
+                placeholders = ", ".join("?" * len(hash_chunk))
+                best_practice_select_query = f"select * from {self.keyword_table_name} as ks where ks.best_practice_hash in ({placeholders})"
+                for row in self.conn.execute(best_practice_select_query, hash_chunk):
+                    keywords[hash_to_practice[row[0]]] = json.loads(row[1])
+            return keywords
+        except Exception as e:
+            self.logger.error(
+                f"Error while checking for keywords of best practices in SQLite table {self.keyword_table_name}: {e}"
+            )
+            raise
+
+    def insert_token_signatures_bulk(self, token_signatures):
+        try:
+            self.logger.info(
+                f"Inserting {len(token_signatures)} token signatures in {self.token_table_name} table"
+            )
+            updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            insert_query = (
+                f"INSERT OR REPLACE INTO {self.token_table_name} "
+                "(file_hash, tokens, updated_by, updated_at) "
+                "VALUES (?, ?, ?, ?)"
+            )
+            with self.conn:
+                self.conn.executemany(
+                    insert_query,
+                    [
+                        (file_hash, json.dumps(tokens), "admin", updated_at)
+                        for file_hash, tokens in token_signatures.items()
+                    ],
+                )
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting token signatures in SQLite table {self.token_table_name}: {e}"
+            )
+            raise
+
+    def get_token_signatures_bulk(self, file_hashes):
+        try:
+            self.logger.info(
+                f"Querying token signatures of {len(file_hashes)} files in SQLite table {self.token_table_name}"
+            )
+            file_hashes = list(set(file_hashes))
+            token_signatures = {}
+            for i in range(0, len(file_hashes), SQLITE_MAX_QUERY_VARIABLES):
+                hash_chunk = file_hashes[i : i + SQLITE_MAX_QUERY_VARIABLES]
+                placeholders = ", ".join("?" * len(hash_chunk))
+                token_select_query = f"select * from {self.token_table_name} as ts where ts.file_hash in ({placeholders})"
+                for row in self.conn.execute(token_select_query, hash_chunk):
+                    token_signatures[row[0]] = json.loads(row[1])
+            return token_signatures
+        except Exception as e:
+            self.logger.error(
+                f"Error while checking for token signatures in SQLite table {self.token_table_name}: {e}"
+            )
+            raise
+
+    def insert_chunk_responses_bulk(self, chunk_responses):
+        try:
+            self.logger.info(
+                f"Inserting {len(chunk_responses)} chunk responses in {self.chunk_table_name} table"
+            )
+            updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            insert_query = (
+                f"INSERT OR REPLACE INTO {self.chunk_table_name} "
+                "(chunk_hash, practice_set_hash, version, response, updated_by, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)"
+            )
+            with self.conn:
+                self.conn.executemany(
+                    insert_query,
+                    [
+                        (*cache_key, json.dumps(response), "admin", updated_at)
+                        for cache_key, response in chunk_responses.items()
+                    ],
+                )
+        except Exception as e:
+            self.logger.error(
+                f"Error while inserting chunk responses in SQLite table {self.chunk_table_name}: {e}"
+            )
+            raise
+
+    def get_chunk_responses_bulk(self, cache_keys):
+        """Returns {(chunk hash, practice set hash, version): response} of the cached keys"""
+        try:
+            self.logger.info(
+                f"Querying {len(cache_keys)} chunk responses in SQLite table {self.chunk_table_name}"
+            )
+            cache_keys = set(cache_keys)
+            chunk_hashes = list({chunk_hash for chunk_hash, _, _ in cache_keys})
+            chunk_responses = {}
+            for i in range(0, len(chunk_hashes), SQLITE_MAX_QUERY_VARIABLES):
+                hash_chunk = chunk_hashes[i : i + SQLITE_MAX_QUERY_VARIABLES]
+                placeholders = ", ".join("?" * len(hash_chunk))
+                chunk_select_query = (
+                    "select chunk_hash, practice_set_hash, version, response "
+                    f"from {self.chunk_table_name} as cs where cs.chunk_hash in ({placeholders})"
+                )
+                for row in self.conn.execute(chunk_select_query, hash_chunk):
+                    if row[:3] in cache_keys:
+                        chunk_responses[row[:3]] = json.loads(row[3])
+            return chunk_responses
+        except Exception as e:
+            self.logger.error(
+                f"Error while checking for chunk responses in SQLite table {self.chunk_table_name}: {e}"
+            )
+            raise
+
     def __del__(self):
         try:
             self.logger.info("Closing SQLite connection")
@@ -0,0 +1,149 @@
+import os
+from collections import Counter
+
+from utils.logger_manager import CustomLogger
+from utils.utilities import count_tokens
+from utils.constants import (
+    LOG_FILE_PATH,
+    PROJECT_STRUCTURE_TOKEN_BUDGET,
+    STRUCTURE_MAX_FILES_PER_FOLDER,
+    STRUCTURE_MAX_FOLDERS_PER_FOLDER,
+    STRUCTURE_IMPORTANT_FILES,
+)
+
+
+class FolderNode:
+    def __init__(self, name):
+        self.name = name
+        # Children keep the walker order, items are ("file", name) or ("folder", node)
+        self.children = []
+        self.total_files = 0
+        self.total_folders = 0
+        self.depth = 0
+
+
+class StructureSummarizer:
+    """Shrinks a project structure text until it fits in a token budget."""
+
+    def __init__(self, project_structure, token_budget=PROJECT_STRUCTURE_TOKEN_BUDGET):
+        self.project_structure = project_structure
+        self.token_budget = token_budget
+        self.important_files = set(STRUCTURE_IMPORTANT_FILES)
+        self.logger = CustomLogger(LOG_FILE_PATH).get_logger()
+
+    def _build_tree(self):
+        root = FolderNode("")
+        stack = [root]
+        for line in self.project_structure.splitlines():
+            stripped = line.lstrip(" ")
+            depth = (len(line) - len(stripped)) // 2
+            del stack[depth + 1 :]
+            parent = stack[-1]
+            if stripped.startswith("|-- "):
+                parent.children.append(("file", stripped[4:]))
+            elif stripped.startswith("/"):
+                folder = FolderNode(stripped[1:])
+                parent.children.append(("folder", folder))
+                stack.append(folder)
+        self._count(root)
+        return root
+
+    def _count(self, root):
+        # Post-order without recursion, deep trees are common in monorepos.
+        order = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for kind, child in node.children:
+                if kind == "folder":
+                    stack.append(child)
+        for node in reversed(order):
+            for kind, child in node.children:
+                if kind == "file":
+                    node.total_files += 1
+                else:
+                    node.total_files += child.total_files
+                    node.total_folders += child.total_folders + 1
+                    node.depth = max(node.depth, child.depth + 1)
+
+    def _describe_files(self, file_names):
+        extensions = Counter(
+            os.path.splitext(name)[1] or name for name in file_names
+        )
+        details = ", ".join(
+            f"{extension}: {count}" for extension, count in extensions.most_common(5)
+        )
+        return f"... {len(file_names)} more files ({details})"
+
+    def _render(self, node, depth, max_depth, max_files, max_folders, lines):
+        indentation = "  " * depth
+        shown_files = 0
+        shown_folders = 0
+        hidden_files = []
+        hidden_folders = 0
+        for kind, child in node.children:
+            if kind == "file":
+                # Manifests and readme files on the top levels are always kept.
+                if shown_files < max_files or (
+                    depth <= 1 and child in self.important_files
+                ):
+                    lines.append(f"{indentation}|-- {child}\n")
+                    shown_files += 1
+                else:
+                    hidden_files.append(child)
+                continue
+
+            if shown_folders >= max_folders:
+                hidden_folders += 1
+                continue
+            shown_folders += 1
+            if depth + 1 >= max_depth and child.children:
+                lines.append(
+                    f"{indentation}/{child.name} ({child.total_files} files, "
+                    f"{child.total_folders} folders)\n"
+                )
+            else:
+                lines.append(f"{indentation}/{child.name}\n")
+                self._render(child, depth + 1, max_depth, max_files, max_folders, lines)
+
+        if hidden_files:
+            lines.append(f"{indentation}|-- {self._describe_files(hidden_files)}\n")
+        if hidden_folders:
+            lines.append(f"{indentation}/... {hidden_folders} more folders\n")
+
+    def _truncate(self, lines):
+        kept = []
+        used_tokens = 0
+        for line in lines:
+            line_tokens = count_tokens(line)
+            if used_tokens + line_tokens > self.token_budget:
+                kept.append("... (truncated)\n")
+                break
+            kept.append(line)
+            used_tokens += line_tokens
+        return "".join(kept)
+
+    def summarize(self):
+        if count_tokens(self.project_structure) <= self.token_budget:
+            return self.project_structure
+
+        root = self._build_tree()
+        limits = [
+            (STRUCTURE_MAX_FILES_PER_FOLDER, STRUCTURE_MAX_FOLDERS_PER_FOLDER),
+            (STRUCTURE_MAX_FILES_PER_FOLDER // 3, STRUCTURE_MAX_FOLDERS_PER_FOLDER // 3),
+        ]
+        lines = []
+        for max_depth in range(root.depth + 1, 0, -1):
+            for max_files, max_folders in limits:
+                lines = []
+                self._render(root, 0, max_depth, max_files, max_folders, lines)
+                summary = "".join(lines)
+                if count_tokens(summary) <= self.token_budget:
+                    self.logger.info(
+                        f"Summarized project structure with depth {max_depth}"
+                    )
+                    return summary
+
+        self.logger.info("Project structure truncated to fit token budget")
+        return self._truncate(lines)
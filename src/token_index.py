@@ -0,0 +1,92 @@
+import re
+import math
+from collections import defaultdict
+
+from fuzzywuzzy import fuzz
+
+from utils.constants import (
+    KEYWORD_TOKEN_MATCH_RATIO,
+    FUZZY_KEYWORD_EXPANSION,
+    FUZZY_EXPANSION_THRESHOLD,
+)
+
+# Same token rules as fuzzywuzzy's full_process: lower case, split on non word characters
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def create_token_signature(content):
+    """Maps every token of the content to the line numbers it occurs on."""
+    signature = defaultdict(list)
+    for line_number, line in enumerate(content.splitlines(), start=1):
+        for token in set(tokenize(line)):
+            signature[token].append(line_number)
+    return dict(signature)
+
+
+class TokenIndex:
+    """Inverted index from token to the files and lines containing it."""
+
+    def __init__(
+        self,
+        match_ratio=KEYWORD_TOKEN_MATCH_RATIO,
+        fuzzy_expansion=FUZZY_KEYWORD_EXPANSION,
+        fuzzy_threshold=FUZZY_EXPANSION_THRESHOLD,
+    ):
+        self.postings = defaultdict(dict)
+        self.match_ratio = match_ratio
+        self.fuzzy_expansion = fuzzy_expansion
+        self.fuzzy_threshold = fuzzy_threshold
+        self.vocabulary_by_prefix = None
+        self.expansions = {}
+
+    def add_file(self, path, signature):
+        for token, line_numbers in signature.items():
+            self.postings[token][path] = line_numbers
+        self.vocabulary_by_prefix = None
+
+    def _get_vocabulary_by_prefix(self):
+        if self.vocabulary_by_prefix is None:
+            self.vocabulary_by_prefix = defaultdict(list)
+            for token in self.postings:
+                self.vocabulary_by_prefix[token[0]].append(token)
+        return self.vocabulary_by_prefix
+
+    def expand(self, token):
+        """Returns the vocabulary tokens matching the keyword token. Fuzzy
+        matching runs over the vocabulary, never over file contents."""
+        if token in self.expansions:
+            return self.expansions[token]
+
+        expanded = {token} if token in self.postings else set()
+        if self.fuzzy_expansion and len(token) > 3:
+            for candidate in self._get_vocabulary_by_prefix().get(token[0], []):
+                if (
+                    abs(len(candidate) - len(token)) <= max(1, len(token) // 5)
+                    and fuzz.ratio(candidate, token) >= self.fuzzy_threshold
+                ):
+                    expanded.add(candidate)
+        self.expansions[token] = expanded
+        return expanded
+
+    def match_keyword(self, keyword):
+        """Returns {path: matched line numbers} of the files containing the keyword."""
+        keyword_tokens = list(dict.fromkeys(tokenize(keyword)))
+        if not keyword_tokens:
+            return {}
+
+        token_matches = defaultdict(dict)
+        for token in keyword_tokens:
+            for vocabulary_token in self.expand(token):
+                for path, line_numbers in self.postings[vocabulary_token].items():
+                    token_matches[path].setdefault(token, set()).update(line_numbers)
+
+        required_tokens = math.ceil(len(keyword_tokens) * self.match_ratio)
+        matched_files = {}
+        for path, matches in token_matches.items():
+            if len(matches) >= required_tokens:
+                matched_files[path] = sorted(set().union(*matches.values()))
+        return matched_files
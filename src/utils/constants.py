@@ -5,8 +5,86 @@ LOG_FILE_TIME_FORMAT = "%d-%m-%Y"  # Time format for log file name
 LOG_FOLDER_PATH = os.path.join(CURRENT_DIRECTORY, "logs")
 LOG_FILE_PATH = os.path.join(LOG_FOLDER_PATH, "log.log")
 FILE_EXTENSIONS = [".py"]
+IGNORED_DIRECTORIES = [
+    "node_modules",
+    "vendor",
+    "third_party",
+    "build",
+    "dist",
+    "target",
+    "out",
+    "venv",
+    "env",
+    "site-packages",
+    "__pycache__",
+]
+MAX_ANALYZABLE_FILE_SIZE_BYTES = 1024 * 1024
+BINARY_DETECTION_BYTES = 8000
+
+# Dependency / import name to framework name used by the local framework detector
+FRAMEWORK_SIGNATURES = {
+    "django": "Django",
+    "flask": "Flask",
+    "fastapi": "FastAPI",
+    "tornado": "Tornado",
+    "pyramid": "Pyramid",
+    "sanic": "Sanic",
+    "aiohttp": "aiohttp",
+    "streamlit": "Streamlit",
+    "langchain": "LangChain",
+    "react": "React",
+    "next": "Next.js",
+    "vue": "Vue",
+    "@angular/core": "Angular",
+    "express": "Express",
+    "@nestjs/core": "NestJS",
+    "svelte": "Svelte",
+    "org.springframework": "Spring",
+    "io.quarkus": "Quarkus",
+    "io.micronaut": "Micronaut",
+}
+EXTENSION_LANGUAGES = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".jsx": "JavaScript",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".java": "Java",
+}
+FRAMEWORK_MANIFEST_FILES = [
+    "requirements.txt",
+    "pyproject.toml",
+    "setup.cfg",
+    "package.json",
+    "pom.xml",
+]
+FRAMEWORK_MANIFEST_SCORE = 3
+FRAMEWORK_IMPORT_SCORE = 1
+FRAMEWORK_IMPORT_SCAN_LIMIT = 500
+MAX_DETECTED_FRAMEWORKS = 2
+
+TIKTOKEN_ENCODING = "cl100k_base"
+PROJECT_STRUCTURE_TOKEN_BUDGET = 4000
+STRUCTURE_MAX_FILES_PER_FOLDER = 15
+STRUCTURE_MAX_FOLDERS_PER_FOLDER = 25
+STRUCTURE_IMPORTANT_FILES = [
+    "README.md",
+    "README.rst",
+    "requirements.txt",
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+    "package.json",
+    "pom.xml",
+    "build.gradle",
+    "Dockerfile",
+    "docker-compose.yml",
+    "Makefile",
+    "manage.py",
+]
 MODEL_NAME = "tiiuae/falcon-180B-chat"
 EMBEDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 768
 AI71_BASE_URL = "https://api.ai71.ai/v1/"
 IGNORABLE_CHARACTERS = ["'", '"', " ", "`", "\n"]
 
@@ -18,14 +96,65 @@ REFERENCE_PATTERN = r"Reference: (.*)"
 
 
 KEYWORD_CHUNK_SIZE = 20
-MAX_WORKERS_FOR_KEYWORD_CHUNKING = 10
+BIFURCATION_CHUNK_TOKEN_LIMIT = 1500
+BIFURCATION_PARTIAL_RESULT_POLICY = "partial"  # "partial" keeps successful chunks, "raise" fails the run
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BASE_DELAY = 1  # Seconds, doubled on every retry
+LLM_RETRY_MAX_DELAY = 30
+KEYWORD_BATCH_SIZE = 10
+KEYWORD_GENERATION_MODE = "llm"  # "llm" falls back to offline keywords on failure, "offline" never calls the LLM
+OFFLINE_KEYWORD_LIMIT = 10
+OFFLINE_KEYWORD_CODE_BOOST = 2.0
+OFFLINE_KEYWORD_REPO_BOOST = 1.5
+OFFLINE_KEYWORD_PHRASE_WEIGHT = 0.5
+OFFLINE_KEYWORD_STOPWORDS = [
+    "the", "and", "for", "are", "but", "not", "you", "all", "any", "can",
+    "had", "her", "was", "one", "our", "out", "has", "have", "his", "how",
+    "its", "may", "new", "now", "old", "see", "two", "way", "who", "did",
+    "get", "let", "use", "using", "used", "should", "must", "always", "never",
+    "instead", "avoid", "make", "sure", "when", "while", "with", "without",
+    "this", "that", "these", "those", "then", "than", "from", "into", "onto",
+    "only", "also", "each", "every", "other", "such", "some", "more", "most",
+    "will", "would", "could", "there", "their", "them", "they", "what",
+    "which", "where", "whether", "because", "about", "like", "example",
+    "code", "method", "methods", "function", "functions", "best", "practice",
+    "need", "needs", "want", "create", "dont", "don", "doesn", "does",
+    "reference", "rule", "thumb", "feel", "something", "separate", "same",
+    "through", "directly", "ensure", "proper", "properly", "try", "place",
+    "making", "based", "given", "always", "within", "over", "under", "very",
+]
+SQLITE_MAX_QUERY_VARIABLES = 900
+MAX_PRACTICE_SOURCES_CONCURRENTLY = 4
+CONFLUENCE_CONNECTION_POOL_SIZE = 10
+CONFLUENCE_CHILD_PAGE_LIMIT = 50
+CONFLUENCE_PAGE_URL_FORMAT = "{base_url}/pages/viewpage.action?pageId={page_id}"
 BEST_PRACTICES_CHUNK_SIZE = 10
-MAX_FILES_PROCESS_CONCURRENTLY = 3
-MAX_CHUNKS_PROCESS_CONCURRENTLY = 3
-FILE_THREAD_PREFIX = "file_analysis_thread"
-CHUNK_THREAD_PREFIX = "chunk_analysis_thread"
+# Every LLM call of the process goes through one scheduler queue
+LLM_MAX_CONCURRENT_REQUESTS = 8
+LLM_TOKENS_PER_MINUTE = 200000  # Token rate limit of the provider, None disables the budget
+LLM_RESPONSE_TOKEN_ESTIMATE = 500
+LLM_SCHEDULER_THREAD_PREFIX = "llm_scheduler_thread"
+# Lower values run first. Setup calls block every later stage.
+LLM_PRIORITY_SETUP = 0
+LLM_PRIORITY_ANALYSIS = 1
+LLM_PRIORITY_FOLLOW_UP = 2
+ASYNC_LLM_MAX_CONCURRENT_REQUESTS = 100  # In-flight requests of the asyncio analyzer
+# Connection pool shared by every LLM and embedding client
+LLM_HTTP_MAX_CONNECTIONS = 100
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+LLM_HTTP_KEEPALIVE_EXPIRY = 60  # Seconds
+LLM_HTTP_TIMEOUT = 600  # Seconds, the OpenAI client default
 STATEMENT_KEYWORD_PATTERN = r"(.+)\[keyword_name: (.+)\]"
-CODE_LINES_CHUNK_SIZE = 10
+LLM_CONTEXT_TOKENS = 2048  # Context window of MODEL_NAME
+# Prompts are counted with TIKTOKEN_ENCODING, which is not the tokenizer of
+# MODEL_NAME, so only this share of the context window is planned for.
+LLM_CONTEXT_SAFETY_MARGIN = 0.8
+CODE_CHUNK_PRACTICE_TOKEN_RESERVE = 400  # Room for a chunk of best practices next to the code
+CODE_CHUNK_MIN_TOKENS = 256
+# Analysis results are persisted by one background writer thread
+RESULT_WRITER_THREAD_NAME = "result_writer_thread"
+RESULT_WRITER_BATCH_SIZE = 500  # Results per transaction
+RESULT_WRITER_FLUSH_INTERVAL = 1  # Seconds a partial batch waits for more results
 
 DOCUMENTATION_CHUNK_TOKEN_LIMIT = 50
 DOCUMENTATION_CHUNK_OVERLAP = 0
@@ -37,7 +166,20 @@ DB_FOLDER_PATH = os.path.join(CURRENT_DIRECTORY, "db")
 SQLITE_DB_NAME = os.path.join(DB_FOLDER_PATH, "sqlite.db")
 SQLITE_KEYWORD_TABLE_NAME = "Keyword_Knowledge_Store"
 SQLITE_FILE_TABLE_NAME = "File_Knowledge_Store"
+SQLITE_FRAMEWORK_TABLE_NAME = "Framework_Knowledge_Store"
+SQLITE_STRUCTURE_TABLE_NAME = "Structure_Summary_Store"
+SQLITE_CONFLUENCE_TABLE_NAME = "Confluence_Page_Store"
+SQLITE_PRACTICE_TABLE_NAME = "Practice_Knowledge_Store"
+SQLITE_TOKEN_TABLE_NAME = "File_Token_Store"
+SQLITE_CHUNK_TABLE_NAME = "Chunk_Response_Store"
 INDEX_FOLDER_PATH = os.path.join(DB_FOLDER_PATH, "vector_db")
+REPO_MIRROR_FOLDER_PATH = os.path.join(DB_FOLDER_PATH, "repo_mirrors")
+REPO_MIRROR_MAX_SIZE_BYTES = 5 * 1024 * 1024 * 1024  # Total size allowed for cached mirrors
+REPO_SHALLOW_CLONE_DEPTH = 1
+REFERENCE_INDEX_FOLDER_PATH = os.path.join(INDEX_FOLDER_PATH, "references")
+REFERENCE_INDEX_MAX_SIZE_BYTES = 512 * 1024 * 1024  # Total size allowed for cached reference indexes
+REFERENCE_INDEX_MEMORY_TTL = 3600  # Seconds a loaded index is used before its page is revalidated
+REFERENCE_PAGE_REQUEST_TIMEOUT = 30  # Seconds
 
 
 LOGGER_BACKUP_COUNT = 30  # Last number of days to keep log files
@@ -49,6 +191,16 @@ LOG_FILE_TIME_FORMAT = "%d-%m-%Y"
 
 
 SIMILARITY_SEARCH_THRESHOLD = 10
+KEYWORD_TOKEN_MATCH_RATIO = 1.0  # Share of a keyword's tokens which must be found in a file
+FUZZY_KEYWORD_EXPANSION = True
+FUZZY_EXPANSION_THRESHOLD = 90
+PARALLEL_FILTER_MIN_FILES = 500  # Smaller repos are filtered in process
+PARALLEL_FILTER_SHARDS_PER_WORKER = 4
+FILTER_TOP_K_FILES_PER_PRACTICE = 25  # None keeps every matching file
+FILTER_TOP_N_PRACTICES_PER_FILE = 10  # None keeps every matching practice
+LLM_CALL_BUDGET = None  # Upper bound of estimated code level LLM calls, None for no limit
+# Lines around a keyword match which still make a code chunk relevant to its practice
+KEYWORD_MATCH_CONTEXT_LINES = 3
 
 IGNORE_CHARS = ["'", '"', " ", "`", "\n"]
 
@@ -101,6 +253,25 @@ Your response should be in the following format:
 Do not add unnecessary quotes around keywords.
 """
 
+KEYWORD_BATCH_PROMPT = """
+Generate an exhaustive list of code-related keywords for each of the provided best practice descriptions that indicate potential deviations from best practices. Only include keywords related to code snippets, libraries, packages, functions, commands, or tools that can be directly searched within files or are commonly used in relevant contexts.
+
+For example:
+- If the best practice is 'Use `with` statements to open files instead of `open()` directly to ensure proper resource management,' generate keywords like 'open()'.
+- If the best practice is 'Always use `requests` library for HTTP requests instead of `urllib2`,' generate keywords like 'urllib2', 'requests', 'HTTP', etc., but also consider additional relevant keywords such as 'get', 'post', 'session', etc.
+
+The keywords must be solely based on the provided best practice descriptions.
+
+Project code uses {framework} framework.
+Best practices:
+{best_practices}
+
+Your response should be a JSON list with one list of keywords per best practice, in the same order as the best practices:
+[["Keyword1", "Keyword2", ...], ["Keyword1", ...], ...]
+The number of lists must be equal to the number of best practices.
+Do not include any additional description in your response.
+"""
+
 
 BIFURCATION_PROMPT = """
 You are a natural language understanding expert and an expert software developer.
@@ -1,4 +1,5 @@
 import logging
+import threading
 from logging.handlers import TimedRotatingFileHandler
 from utils.constants import (
     LOG_FILE_TIME_FORMAT,
@@ -23,13 +24,19 @@ class CustomTimedRotatingFileHandler(TimedRotatingFileHandler):
 def singleton(cls):
     """Handles creating singleton class"""
     all_instance = [None]
+    # Concurrent first calls must not create an instance each
+    instance_lock = threading.Lock()
 
     def decorator(*args, **kwargs):
         """Inner function"""
         if all_instance[0] is None:
-            all_instance[0] = cls(*args, **kwargs)
+            with instance_lock:
+                if all_instance[0] is None:
+                    all_instance[0] = cls(*args, **kwargs)
         return all_instance[0]
 
+    # The class itself, for separate instances in tests
+    decorator.__wrapped__ = cls
     return decorator
 
 
@@ -5,11 +5,18 @@ from ast import literal_eval
 from collections import defaultdict
 from urllib.parse import urlparse
 import shutil
+import hashlib
+import random
+from functools import lru_cache
 
 from utils.constants import (
     LOG_FOLDER_PATH,
     DB_FOLDER_PATH,
     LOG_FILE_PATH,
+    TIKTOKEN_ENCODING,
+    IGNORE_CHARS,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
     # REPORT_FOLDER_PATH,
 )
 from utils.logger_manager import CustomLogger
@@ -44,6 +51,51 @@ def read_file(file_path):
     return file_content
 
 
+CLEAN_TEXT_TABLE = str.maketrans("", "", "".join(IGNORE_CHARS))
+
+
+def clean_text(text):
+    """Removes the ignorable characters from the text before hashing"""
+    return text.translate(CLEAN_TEXT_TABLE)
+
+
+def create_hash(text):
+    """Creates the SHA-256 hex digest of the text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _get_token_encoder():
+    import tiktoken
+
+    return tiktoken.get_encoding(TIKTOKEN_ENCODING)
+
+
+def count_tokens(text):
+    """Counts the tokens of the text
+
+    params:
+        - text
+
+    return:
+        - int : Number of tokens
+    """
+    return len(_get_token_encoder().encode(text, disallowed_special=()))
+
+
+def get_retry_delay(attempt):
+    """Returns the exponential backoff delay with jitter of a failed attempt
+
+    params:
+        - attempt : Number of the failed attempt, starting from 0
+
+    return:
+        - float : Seconds to wait before the next attempt
+    """
+    delay = min(LLM_RETRY_BASE_DELAY * (2**attempt), LLM_RETRY_MAX_DELAY)
+    return delay + random.uniform(0, delay / 2)
+
+
 def read_directory_tree(code_directory_link: str):
     """Reads the directory tree"""
     logger.info("Reading directory tree: " + code_directory_link)
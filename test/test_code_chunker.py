@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("tiktoken")
+
+from code_chunker import CodeChunker
+
+PYTHON_SOURCE = """import os
+
+
+# Comments above a definition belong to it
+@decorator
+def first():
+    return 1
+
+
+def second():
+    value = 2
+    return value
+
+
+class Third:
+    def method(self):
+        return 3
+"""
+
+
+def create_chunker(source, path="module.py", token_budget=10**6):
+    return CodeChunker(path, source.splitlines(keepends=True), token_budget=token_budget)
+
+
+def test_python_units_follow_top_level_statements():
+    chunker = create_chunker(PYTHON_SOURCE)
+    assert chunker.get_units() == [(1, 3), (4, 9), (10, 14), (15, 17)]
+
+
+def test_small_file_is_one_chunk_with_its_line_numbers():
+    chunker = create_chunker("\nx = 1\n\ny = 2\n")
+    assert chunker.chunk() == [(2, 4, ["x = 1\n", "y = 2\n"])]
+
+
+def test_large_function_is_split_along_its_body():
+    body = "".join(f"    value_{i} = compute_value({i}, 'argument number {i}')\n" for i in range(40))
+    source = "def large():\n" + body
+    full_chunker = create_chunker(source)
+    token_budget = full_chunker._tokens(1, 41) // 3
+
+    chunks = create_chunker(source, token_budget=token_budget).chunk()
+
+    assert len(chunks) > 1
+    # The header stays with the start of the body and no line is lost
+    assert chunks[0][0] == 1
+    assert sum(len(lines) for _, _, lines in chunks) == 41
+    for (_, end, _), (next_start, _, _) in zip(chunks, chunks[1:]):
+        assert next_start == end + 1
+
+
+def test_invalid_python_falls_back_to_blank_line_blocks():
+    source = "def broken(:\n    pass\n\ndef other():\n    pass\n"
+    chunker = create_chunker(source, token_budget=1)
+    starts = [start for start, _ in chunker.get_units()]
+    assert 4 in starts
+    assert 3 not in starts
+
+
+def test_other_languages_are_split_at_blank_line_blocks():
+    source = "function a() {\n  return 1;\n}\n\nfunction b() {\n  return 2;\n}\n"
+    full_chunker = create_chunker(source, path="module.js")
+    token_budget = full_chunker._tokens(1, 4)
+
+    chunks = create_chunker(source, path="module.js", token_budget=token_budget).chunk()
+
+    assert [(start, end) for start, end, _ in chunks] == [(1, 3), (5, 7)]
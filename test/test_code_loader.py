@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("langchain_openai")
+
+from code_loader import parse_diff_line_ranges, unquote_diff_path
+
+
+def test_unquote_diff_path_strips_the_tab_of_paths_with_spaces():
+    assert unquote_diff_path("b/my file.py\t") == "b/my file.py"
+
+
+def test_unquote_diff_path_undoes_c_quoting():
+    assert unquote_diff_path('"b/say \\"hi\\".py"') == 'b/say "hi".py'
+    assert unquote_diff_path('"b/caf\\303\\251.py"') == "b/café.py"
+    assert unquote_diff_path("b/plain.py") == "b/plain.py"
+
+
+def test_parse_diff_line_ranges():
+    diff_output = "\n".join(
+        [
+            "diff --git a/app.py b/app.py",
+            "--- a/app.py",
+            "+++ b/app.py",
+            "@@ -1,0 +2,3 @@",
+            "+import os",
+            "+++ looks like a header",
+            "+x = 1",
+            "@@ -10 +12 @@",
+            "-old",
+            "+new",
+            "@@ -20,2 +21,0 @@",
+            "-removed",
+            "-removed",
+            "diff --git a/new file.py b/new file.py",
+            "--- /dev/null",
+            "+++ b/new file.py\t",
+            "@@ -0,0 +1,2 @@",
+            "+a = 1",
+            "+b = 2",
+            "diff --git a/gone.py b/gone.py",
+            "--- a/gone.py",
+            "+++ /dev/null",
+            "@@ -1 +0,0 @@",
+            "-gone",
+        ]
+    )
+
+    assert parse_diff_line_ranges(diff_output) == {
+        "app.py": [(2, 4), (12, 12), (21, 22)],
+        "new file.py": [(1, 2)],
+    }
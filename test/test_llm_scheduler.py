@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+import llm_scheduler
+from llm_scheduler import LLMScheduler, TokenBucket
+
+
+def create_scheduler():
+    # One worker runs the queued calls one at a time, in queue order
+    return LLMScheduler.__wrapped__(max_concurrency=1, tokens_per_minute=0)
+
+
+def block_worker(scheduler):
+    started = threading.Event()
+    release = threading.Event()
+    scheduler.submit(lambda: (started.set(), release.wait(5)))
+    started.wait(5)
+    return release
+
+
+def test_lower_priority_values_run_first():
+    scheduler = create_scheduler()
+    release = block_worker(scheduler)
+    order = []
+    futures = [
+        scheduler.submit(order.append, name, priority=priority)
+        for name, priority in [("follow_up", 2), ("setup", 0), ("analysis_1", 1), ("analysis_2", 1)]
+    ]
+    release.set()
+    for future in futures:
+        future.result(5)
+
+    assert order == ["setup", "analysis_1", "analysis_2", "follow_up"]
+
+
+def test_map_ordered_returns_results_and_errors_in_item_order():
+    scheduler = create_scheduler()
+
+    def half(value):
+        if value % 2:
+            raise ValueError(value)
+        return value // 2
+
+    results = scheduler.map_ordered(half, [4, 3, 2])
+
+    assert [result for result, _ in results] == [2, None, 1]
+    assert isinstance(results[1][1], ValueError)
+
+
+def test_failed_call_is_queued_again(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "get_retry_delay", lambda attempt: 0)
+    scheduler = create_scheduler()
+    attempts = []
+
+    def flaky_call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ValueError("failed attempt")
+        return "ok"
+
+    assert scheduler.submit(flaky_call, retries=2).result(5) == "ok"
+    assert len(attempts) == 3
+
+    attempts.clear()
+    with pytest.raises(ValueError):
+        scheduler.submit(flaky_call, retries=1).result(5)
+    assert len(attempts) == 2
+
+
+def test_token_bucket_waits_for_missing_tokens():
+    bucket = TokenBucket(600)
+
+    assert bucket._take(600) == 0
+    # 10 tokens refill every second
+    assert bucket._take(60) == pytest.approx(6, abs=0.1)
+
+
+def test_token_bucket_caps_requests_above_the_budget():
+    bucket = TokenBucket(100)
+
+    assert bucket._take(1000) == 0
+    assert bucket.tokens == pytest.approx(0, abs=1)
+
+
+def test_token_bucket_without_budget_never_waits():
+    bucket = TokenBucket(0)
+    bucket.acquire(10**9)
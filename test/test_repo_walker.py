@@ -0,0 +1,63 @@
+import os
+
+from repo_walker import GitIgnoreRule, RepoWalker
+
+
+def write_file(path, content=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content)
+
+
+def test_unanchored_pattern_matches_at_any_depth(tmp_path):
+    rule = GitIgnoreRule("*.log", str(tmp_path))
+    assert rule.match(str(tmp_path / "app.log"), is_dir=False)
+    assert rule.match(str(tmp_path / "src" / "deep" / "app.log"), is_dir=False)
+    assert not rule.match(str(tmp_path / "app.py"), is_dir=False)
+
+
+def test_pattern_with_slash_is_anchored(tmp_path):
+    rule = GitIgnoreRule("/build", str(tmp_path))
+    assert rule.match(str(tmp_path / "build"), is_dir=True)
+    assert not rule.match(str(tmp_path / "src" / "build"), is_dir=True)
+
+    rule = GitIgnoreRule("docs/*.md", str(tmp_path))
+    assert rule.match(str(tmp_path / "docs" / "index.md"), is_dir=False)
+    assert not rule.match(str(tmp_path / "src" / "docs" / "index.md"), is_dir=False)
+
+
+def test_directory_pattern_only_matches_directories(tmp_path):
+    rule = GitIgnoreRule("cache/", str(tmp_path))
+    assert rule.match(str(tmp_path / "cache"), is_dir=True)
+    assert not rule.match(str(tmp_path / "cache"), is_dir=False)
+
+
+def test_double_star_matches_any_folders(tmp_path):
+    rule = GitIgnoreRule("a/**/b.py", str(tmp_path))
+    assert rule.match(str(tmp_path / "a" / "b.py"), is_dir=False)
+    assert rule.match(str(tmp_path / "a" / "x" / "y" / "b.py"), is_dir=False)
+
+
+def test_walk_applies_negation_and_nested_gitignore(tmp_path):
+    write_file(str(tmp_path / ".gitignore"), "gen_*.py\n!gen_keep.py\n/generated\n")
+    write_file(str(tmp_path / "main.py"))
+    write_file(str(tmp_path / "gen_drop.py"))
+    write_file(str(tmp_path / "gen_keep.py"))
+    write_file(str(tmp_path / "generated" / "a.py"))
+    write_file(str(tmp_path / "lib" / "generated" / "b.py"))
+    write_file(str(tmp_path / "lib" / ".gitignore"), "!gen_local.py\n")
+    write_file(str(tmp_path / "lib" / "gen_local.py"))
+    write_file(str(tmp_path / "lib" / "gen_other.py"))
+
+    files, structure = RepoWalker(str(tmp_path)).walk()
+
+    relative_files = sorted(os.path.relpath(path, tmp_path) for path in files)
+    assert relative_files == [
+        "gen_keep.py",
+        os.path.join("lib", "gen_local.py"),
+        os.path.join("lib", "generated", "b.py"),
+        "main.py",
+    ]
+    assert "gen_drop.py" not in structure
+    assert "/generated\n" not in structure.splitlines(keepends=True)
+    assert "  /generated\n" in structure
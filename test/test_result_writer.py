@@ -0,0 +1,41 @@
+import result_writer
+from knowledge_db import DB
+from result_writer import ResultWriter
+
+
+def create_writer(monkeypatch, tmp_path, **kwargs):
+    db_path = str(tmp_path / "results.db")
+    monkeypatch.setattr(result_writer, "DB", lambda: DB(sqlite_db_name=db_path))
+    return ResultWriter(**kwargs), DB(sqlite_db_name=db_path)
+
+
+def test_close_writes_every_queued_result(monkeypatch, tmp_path):
+    writer, db = create_writer(monkeypatch, tmp_path, flush_interval=60)
+    chunk_responses = {
+        (f"chunk_{i}", "practices", "version"): {"keyword": [{"status": "Done"}]}
+        for i in range(5)
+    }
+    for cache_key, response in chunk_responses.items():
+        writer.add_chunk_responses({cache_key: response})
+
+    writer.close()
+
+    assert not writer.thread.is_alive()
+    assert db.get_chunk_responses(list(chunk_responses)) == chunk_responses
+
+
+def test_batches_are_sized_by_result_count(monkeypatch, tmp_path):
+    writer, _ = create_writer(monkeypatch, tmp_path, batch_size=3, flush_interval=60)
+    batch_sizes = []
+    monkeypatch.setattr(
+        writer,
+        "_write",
+        lambda batch: batch_sizes.append(sum(len(responses) for _, responses in batch)),
+    )
+    for i in range(5):
+        writer.add_file_responses({(f"file_{i}", "practice_a"): "a", (f"file_{i}", "practice_b"): "b"})
+
+    writer.close()
+
+    assert sum(batch_sizes) == 10
+    assert all(size <= 4 for size in batch_sizes)
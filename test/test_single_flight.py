@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_call(value):
+        calls.append(value)
+        started.set()
+        release.wait(5)
+        return value * 2
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(single_flight.do("key", slow_call, 21)))
+        for _ in range(5)
+    ]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [21]
+    assert results == [42] * 5
+    assert single_flight.do("key", slow_call, 0) == 42
+
+
+def test_failed_call_is_not_memoized():
+    single_flight = SingleFlight()
+    attempts = []
+
+    def flaky_call():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("first attempt fails")
+        return "ok"
+
+    with pytest.raises(ValueError):
+        single_flight.do("key", flaky_call)
+    assert single_flight.do("key", flaky_call) == "ok"
+    assert len(attempts) == 2
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("tiktoken")
+
+from structure_summarizer import StructureSummarizer
+from utils.utilities import count_tokens
+
+
+def create_structure(folder_count, files_per_folder):
+    lines = ["|-- requirements.txt\n", "|-- README.md\n"]
+    for folder in range(folder_count):
+        lines.append(f"/package_{folder}\n")
+        lines.extend(
+            f"  |-- module_{folder}_{index}.py\n" for index in range(files_per_folder)
+        )
+    return "".join(lines)
+
+
+def test_structure_within_budget_is_unchanged():
+    structure = create_structure(2, 2)
+    assert StructureSummarizer(structure, token_budget=10**6).summarize() == structure
+
+
+def test_large_structure_is_summarized_within_budget():
+    structure = create_structure(40, 40)
+    token_budget = count_tokens(structure) // 10
+
+    summary = StructureSummarizer(structure, token_budget=token_budget).summarize()
+
+    assert count_tokens(summary) <= token_budget
+    assert "|-- requirements.txt\n" in summary
+    assert "more files (.py: " in summary or "files, " in summary
+
+
+def test_structure_is_truncated_when_no_summary_fits():
+    structure = create_structure(40, 40)
+
+    summary = StructureSummarizer(structure, token_budget=20).summarize()
+
+    assert summary.endswith("... (truncated)\n")
@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("fuzzywuzzy")
+
+from token_index import TokenIndex, create_token_signature, tokenize
+
+
+def create_index(files, **kwargs):
+    token_index = TokenIndex(fuzzy_expansion=False, **kwargs)
+    for path, content in files.items():
+        token_index.add_file(path, create_token_signature(content))
+    return token_index
+
+
+FILES = {
+    "a.py": "import requests\nsession = requests.Session()\n",
+    "b.py": "import urllib2\nurllib2.urlopen(url)\n",
+    "c.py": "session = None\n",
+}
+
+
+def test_tokenize_splits_on_non_word_characters():
+    assert tokenize("requests.Session()") == ["requests", "session"]
+
+
+def test_signature_maps_tokens_to_line_numbers():
+    signature = create_token_signature(FILES["a.py"])
+    assert signature["requests"] == [1, 2]
+    assert signature["session"] == [2]
+
+
+def test_every_keyword_token_is_required_by_default():
+    token_index = create_index(FILES)
+    assert token_index.match_keyword("requests.Session") == {"a.py": [1, 2]}
+
+
+def test_match_ratio_allows_partial_keyword_matches():
+    token_index = create_index(FILES, match_ratio=0.5)
+    assert token_index.match_keyword("requests.Session") == {
+        "a.py": [1, 2],
+        "c.py": [1],
+    }
+
+
+def test_keyword_without_tokens_matches_nothing():
+    assert create_index(FILES).match_keyword("()") == {}
+
+
+def test_fuzzy_expansion_matches_close_vocabulary_tokens():
+    token_index = TokenIndex(fuzzy_expansion=True, fuzzy_threshold=90)
+    token_index.add_file("a.py", create_token_signature("import requestss\n"))
+    assert token_index.match_keyword("requests") == {"a.py": [1]}
+    assert token_index.match_keyword("request_id") == {}